@@ -0,0 +1,27 @@
+"""Пересчет агрегатов аналитики (post_daily_stats, post_hashtag_stats) по всем постам.
+
+Нужен один раз после миграции и при расхождении агрегатов; дальше они обновляются при записи постов.
+Выполняется в одной транзакции: дашборды до коммита видят прежние значения, запись постов ждет окончания пересчета.
+
+    python -m app.commands.backfill_analytics
+"""
+import argparse
+import asyncio
+
+from ..database import AsyncSessionLocal, dispose_engines
+from ..repositories import analytics as analytics_repo
+
+
+async def main():
+    try:
+        async with AsyncSessionLocal() as session:
+            await analytics_repo.rebuild_rollups(session)
+            await session.commit()
+        print("Analytics rollups rebuilt")
+    finally:
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    argparse.ArgumentParser(description="Rebuild analytics rollups from the posts table").parse_args()
+    asyncio.run(main())
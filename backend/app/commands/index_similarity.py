@@ -0,0 +1,57 @@
+"""Построение индекса похожести (MinHash) для постов, созданных до его появления.
+
+Работает пачками, каждая пачка в своей транзакции; повторный запуск продолжает с места остановки.
+
+    python -m app.commands.index_similarity --batch-size 500
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import select, update
+
+from ..database import AsyncSessionLocal, dispose_engines
+from ..models.models import Post
+from ..repositories import similarity as similarity_repo
+from ..utils import minhash
+
+
+async def index_similarity(batch_size: int) -> int:
+    indexed = 0
+    last_id = 0
+    while True:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(Post.id, Post.user_id, Post.company_name, Post.title, Post.description)
+                .where(Post.id > last_id, Post.minhash.is_(None))
+                .order_by(Post.id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                return indexed
+            for post_id, user_id, company_name, title, description in rows:
+                last_id = post_id
+                sig = minhash.post_signature(title, description)
+                if sig is None:
+                    continue
+                packed = minhash.pack(sig)
+                await session.execute(update(Post).where(Post.id == post_id).values(minhash=packed))
+                await similarity_repo.index_posts(session, user_id, [(post_id, company_name, packed)])
+                indexed += 1
+            await session.commit()
+        print(f"Indexed {indexed} posts (last post id {last_id})")
+
+
+async def main(batch_size: int):
+    try:
+        indexed = await index_similarity(batch_size)
+        print(f"Done, indexed {indexed} posts")
+    finally:
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the near-duplicate index for existing posts")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size))
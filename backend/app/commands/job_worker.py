@@ -0,0 +1,43 @@
+"""Отдельный процесс воркеров очереди генераций (без HTTP), например на выделенном узле.
+
+Число воркеров задает пропускную способность генераций; в процессах API их можно отключить (JOBS_WORKER_ENABLED=false).
+По SIGTERM/SIGINT выполняемые задания возвращаются в очередь.
+
+    python -m app.commands.job_worker --concurrency 16
+"""
+import argparse
+import asyncio
+import signal
+
+from ..config import settings
+from ..database import dispose_engines
+from ..utils import images
+from ..utils.jobs import job_queue
+from ..utils.llm import close_openai_client
+# Импорт регистрирует обработчики заданий generate-ideas и generate-post
+from ..routers import chatgpt_api  # noqa: F401
+
+
+async def main(concurrency: int):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+
+    job_queue.start(concurrency)
+    print(f"Job worker started with {concurrency} workers")
+    try:
+        await stop.wait()
+    finally:
+        await job_queue.stop()
+        images.shutdown_executor()
+        await close_openai_client()
+        await dispose_engines()
+    print(f"Job worker stopped: {job_queue.stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run generation job workers")
+    parser.add_argument("--concurrency", type=int, default=settings.jobs_concurrency)
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency))
@@ -0,0 +1,62 @@
+"""Перенос изображений постов из колонки image_base64 в blob store (с перекодированием и миниатюрами).
+
+Работает пачками, каждая пачка в своей транзакции; повторный запуск продолжает с места остановки.
+
+    python -m app.commands.migrate_images --batch-size 100
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import select, update
+
+from ..database import AsyncSessionLocal, dispose_engines
+from ..models.models import Post
+from ..utils import images
+from ..utils.blob_store import decode_base64_image
+
+
+async def migrate_images(batch_size: int) -> int:
+    moved = 0
+    last_id = 0
+    while True:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(Post.id, Post.image_base64)
+                .where(Post.id > last_id, Post.image_base64.is_not(None), Post.image_hash.is_(None))
+                .order_by(Post.id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                return moved
+            for post_id, image_base64 in rows:
+                last_id = post_id
+                try:
+                    image_hash, thumbnails = await images.store_image(decode_base64_image(image_base64))
+                except ValueError as e:
+                    print(f"Post {post_id}: {e}, skipped")
+                    continue
+                await session.execute(
+                    update(Post)
+                    .where(Post.id == post_id)
+                    .values(image_hash=image_hash, thumbnails=thumbnails, image_base64=None)
+                )
+                moved += 1
+            await session.commit()
+        print(f"Moved {moved} images (last post id {last_id})")
+
+
+async def main(batch_size: int):
+    try:
+        moved = await migrate_images(batch_size)
+        print(f"Done, moved {moved} images")
+    finally:
+        images.shutdown_executor()
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move post images from image_base64 to the blob store")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size))
@@ -0,0 +1,156 @@
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен, без него отдаем gzip
+    brotli = None
+
+# Уже сжатые форматы повторно не сжимаем
+INCOMPRESSIBLE_PREFIXES = ("image/", "video/", "audio/", "application/zip", "application/gzip", "application/octet-stream")
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        # wbits=31 - формат gzip (заголовок и CRC), а не голый deflate
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        # Синхронный сброс, чтобы клиент получал потоковые ответы по частям, а не в конце
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        if name.strip().lower() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class CompressionMiddleware:
+    """Сжатие ответов brotli или gzip (по Accept-Encoding) начиная с minimum_size байт.
+
+    Не трогает ответы с Content-Encoding, частичные (206), 304 и уже сжатые форматы,
+    поэтому Range-запросы к /media и ETag изображений работают как раньше.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _choose(self, accept_encoding: str) -> Optional[str]:
+        if brotli is not None and _accepts(accept_encoding, "br"):
+            return "br"
+        if _accepts(accept_encoding, "gzip"):
+            return "gzip"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = self._choose(Headers(scope=scope).get("accept-encoding", ""))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(self, coding)(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, coding: str):
+        self.app = middleware.app
+        self.minimum_size = middleware.minimum_size
+        self.coding = coding
+        if coding == "br":
+            self.encoder = _BrotliEncoder(middleware.brotli_quality)
+        else:
+            self.encoder = _GzipEncoder(middleware.gzip_level)
+        self.send: Optional[Send] = None
+        self.initial_message: Optional[Message] = None
+        self.started = False
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    def _should_skip(self, message: Message) -> bool:
+        headers = Headers(raw=message["headers"])
+        if message["status"] in (204, 206, 304) or "content-encoding" in headers:
+            return True
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(INCOMPRESSIBLE_PREFIXES)
+
+    async def send_compressed(self, message: Message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # Заголовки отправляем вместе с первым фрагментом тела, когда известно, сжимаем ли
+            self.initial_message = message
+            self.passthrough = self._should_skip(message)
+            return
+        if message_type != "http.response.body":
+            await self.send(message)
+            return
+        if self.passthrough:
+            if not self.started:
+                self.started = True
+                await self.send(self.initial_message)
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not self.started:
+            self.started = True
+            if not more_body and len(body) < self.minimum_size:
+                # Маленькие ответы сжатие не окупают
+                await self.send(self.initial_message)
+                await self.send(message)
+                self.passthrough = True
+                return
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers["Content-Encoding"] = self.coding
+            headers.add_vary_header("Accept-Encoding")
+            # Сильный ETag относится к несжатому представлению
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                body = self.encoder.compress(body) + self.encoder.finish()
+                headers["Content-Length"] = str(len(body))
+                await self.send(self.initial_message)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            await self.send(self.initial_message)
+
+        chunk = self.encoder.compress(body)
+        chunk += self.encoder.flush() if more_body else self.encoder.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -2,15 +2,11 @@ import os
 from pathlib import Path
 from pydantic import Field
 from pydantic_settings import BaseSettings
-from dotenv import load_dotenv
 
-# Загружаем основные переменные окружения
-load_dotenv()
+BASE_DIR = Path(__file__).parent.parent
 
-# Загружаем переменные из .env.gpt, если файл существует
-gpt_env_path = Path(__file__).parent.parent / '.env.gpt'
-if gpt_env_path.exists():
-    load_dotenv(gpt_env_path)
+# Файлы окружения читаются один раз самим Settings; .env.gpt (ключи OpenAI) имеет приоритет
+ENV_FILES = (".env", BASE_DIR / ".env", BASE_DIR / ".env.gpt")
 
 class Settings(BaseSettings):
     secret_key: str = Field(default="09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7")
@@ -19,8 +15,119 @@ class Settings(BaseSettings):
     database_url: str = Field(default="postgresql://postgres:password@db:5432/marketolog")
     openai_api_key: str = Field(default="YA_PIDORAS")
 
+    # Пулы соединений (на каждый движок в каждом воркере); statement_timeout 0 - без ограничения
+    db_pool_size: int = Field(default=5)
+    db_max_overflow: int = Field(default=10)
+    db_pool_timeout: float = Field(default=30.0)
+    db_pool_recycle: int = Field(default=1800)
+    db_pool_pre_ping: bool = Field(default=True)
+    db_statement_timeout_ms: int = Field(default=0)
+
+    # Реплики для чтения (через запятую); пустая строка - все запросы идут в primary
+    database_replica_urls: str = Field(default="")
+    replica_retry_seconds: float = Field(default=30.0)
+    read_your_writes_seconds: float = Field(default=5.0)
+
+    # Кеш аутентифицированных пользователей (0 - отключить)
+    principal_cache_ttl_seconds: int = Field(default=60)
+    principal_cache_max_size: int = Field(default=10000)
+
+    # Пул для bcrypt: thread или process, размер очереди ожидания сверх числа воркеров
+    password_hash_executor: str = Field(default="thread")
+    password_hash_workers: int = Field(default=os.cpu_count() or 1)
+    password_hash_queue_size: int = Field(default=32)
+    password_hash_retry_after_seconds: int = Field(default=1)
+
+    # Денай-лист отозванных токенов: фильтр Блума и частота синхронизации с БД
+    revocation_filter_capacity: int = Field(default=100000)
+    revocation_filter_error_rate: float = Field(default=0.001)
+    revocation_refresh_seconds: float = Field(default=5.0)
+    revocation_rebuild_seconds: float = Field(default=3600.0)
+
+    # Ограничение попыток входа (token bucket по email и IP, экспоненциальная блокировка после неудач)
+    login_email_rate_per_minute: float = Field(default=5.0)
+    login_email_burst: int = Field(default=5)
+    login_ip_rate_per_minute: float = Field(default=30.0)
+    login_ip_burst: int = Field(default=20)
+    login_backoff_threshold: int = Field(default=3)
+    login_backoff_base_seconds: float = Field(default=2.0)
+    login_backoff_max_seconds: float = Field(default=300.0)
+    login_rate_limit_max_keys: int = Field(default=100000)
+    trust_forwarded_for: bool = Field(default=False)
+
+    # Миграции при старте; отключить, если они выполняются отдельным шагом деплоя
+    run_migrations_on_startup: bool = Field(default=True)
+
+    # Хранилище изображений (по хешу содержимого); media_url_prefix можно направить на CDN
+    blob_store_backend: str = Field(default="local")
+    blob_store_path: str = Field(default="media")
+    media_url_prefix: str = Field(default="/media")
+
+    # Максимальное число постов в одном запросе POST /posts/batch
+    posts_batch_max_size: int = Field(default=500)
+
+    # Сжатие ответов (brotli, если установлен, иначе gzip); 0 в compression_minimum_size отключает сжатие
+    compression_minimum_size: int = Field(default=1024)
+    compression_gzip_level: int = Field(default=6)
+    compression_brotli_quality: int = Field(default=4)
+
+    # Размер пачки строк при потоковой выгрузке GET /posts/export
+    export_chunk_size: int = Field(default=500)
+
+    # Отложенная публикация: размер пакета, максимальный интервал между проверками БД, сколько ближайших публикаций держать в памяти
+    scheduler_enabled: bool = Field(default=True)
+    scheduler_batch_size: int = Field(default=100)
+    scheduler_poll_seconds: float = Field(default=30.0)
+    scheduler_prefetch: int = Field(default=1000)
+
+    # Обработка изображений: формат (webp или jpeg), качество, максимальная сторона, миниатюры для списков, размер пула процессов
+    image_format: str = Field(default="webp")
+    image_quality: int = Field(default=80)
+    image_max_side: int = Field(default=1024)
+    image_thumbnail_sizes: str = Field(default="256,512")
+    image_workers: int = Field(default=max(1, (os.cpu_count() or 1) // 2))
+
+    # Похожие посты: минимальная оценка сходства (Жаккар по словам) и число повторных генераций идей при дублях
+    similar_posts_min_similarity: float = Field(default=0.6)
+    ideas_dedup_regenerations: int = Field(default=1)
+
+    # Клиент OpenAI: общий пул соединений на процесс, таймауты (секунды) и повторы с джиттером на 429/5xx
+    openai_max_connections: int = Field(default=200)
+    openai_timeout_seconds: float = Field(default=60.0)
+    openai_image_timeout_seconds: float = Field(default=120.0)
+    openai_connect_timeout_seconds: float = Field(default=5.0)
+    openai_max_retries: int = Field(default=3)
+    openai_retry_base_seconds: float = Field(default=0.5)
+    openai_retry_max_seconds: float = Field(default=8.0)
+
+    # Генерация изображений: одновременно на процесс и на пользователя, общий таймаут одного изображения (секунды)
+    image_generation_concurrency: int = Field(default=20)
+    image_generation_per_user: int = Field(default=3)
+    image_generation_timeout_seconds: float = Field(default=60.0)
+
+    # Кеш генераций: TTL записей в БД (0 - кеш выключен), размер LRU в памяти процесса
+    # и цены для оценки сэкономленного (USD за 1000 токенов и за изображение)
+    generation_cache_ttl_seconds: int = Field(default=7 * 24 * 3600)
+    generation_cache_memory_size: int = Field(default=1000)
+    generation_cost_per_1k_tokens: float = Field(default=0.002)
+    generation_cost_per_image: float = Field(default=0.04)
+
+    # Очередь фоновых генераций: воркеры в процессе API (false - только отдельный python -m app.commands.job_worker),
+    # их число, опрос очереди и таймаут задания (секунды), попытки после падения воркера, лимит заданий пользователя
+    jobs_worker_enabled: bool = Field(default=True)
+    jobs_concurrency: int = Field(default=4)
+    jobs_poll_seconds: float = Field(default=2.0)
+    jobs_timeout_seconds: float = Field(default=300.0)
+    jobs_max_attempts: int = Field(default=3)
+    jobs_max_pending_per_user: int = Field(default=20)
+    jobs_wait_max_seconds: float = Field(default=30.0)
+
+    # Лог запросов к OpenAI, обработчик создается при старте приложения
+    ai_log_file: str = Field(default="chatgpt_api.log")
+
     class Config:
-        env_file = ".env"
+        env_file = ENV_FILES
         env_file_encoding = "utf-8"
+        extra = "ignore"
 
 settings = Settings()
\ No newline at end of file
@@ -1,32 +1,242 @@
-from sqlalchemy import create_engine
+import itertools
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine, exc
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from .config import settings
+from .metrics import Histogram
+
+# Границы гистограммы ожидания свободного соединения из пула (секунды)
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class _PoolWaitMixin:
+    """Замеряет время ожидания соединения и таймауты пула"""
+
+    def _do_get(self):
+        if not hasattr(self, "wait_time"):
+            self.wait_time = Histogram(POOL_WAIT_BUCKETS)
+            self.timeouts = 0
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.wait_time.observe(time.perf_counter() - started)
+
+
+class InstrumentedQueuePool(_PoolWaitMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_PoolWaitMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _engine_options(is_async: bool, url: str = settings.database_url) -> dict:
+    options = {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    # statement_timeout задается на уровне сессии PostgreSQL при подключении
+    if settings.db_statement_timeout_ms and url.startswith("postgresql"):
+        if is_async:
+            options["connect_args"] = {
+                "server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)}
+            }
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={settings.db_statement_timeout_ms}"}
+    return options
 
-# Синхронное подключение для Alembic
+
+# Движки и пулы создаются при первом обращении, а не при импорте модуля
 SQLALCHEMY_DATABASE_URL = settings.database_url
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Асинхронное подключение для приложения
-# Меняем postgresql:// на postgresql+asyncpg:// для асинхронного подключения
-ASYNC_SQLALCHEMY_DATABASE_URL = settings.database_url.replace('postgresql://', 'postgresql+asyncpg://')
-async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
-AsyncSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=async_engine, class_=AsyncSession)
+
+def _async_url(url: str) -> str:
+    # Меняем postgresql:// на postgresql+asyncpg:// для асинхронного подключения
+    return url.replace('postgresql://', 'postgresql+asyncpg://')
+
+
+ASYNC_SQLALCHEMY_DATABASE_URL = _async_url(settings.database_url)
 
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+
+@lru_cache(maxsize=None)
+def get_engine():
+    """Синхронное подключение (Alembic)"""
+    return create_engine(SQLALCHEMY_DATABASE_URL, **_engine_options(is_async=False))
+
+
+@lru_cache(maxsize=None)
+def get_async_engine():
+    """Асинхронное подключение для приложения"""
+    return create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, **_engine_options(is_async=True))
+
+
+@lru_cache(maxsize=None)
+def get_session_factory():
+    # expire_on_commit=False: после коммита атрибуты не должны подгружаться лениво, в async это недоступно
+    return async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+
+
+def AsyncSessionLocal():
+    return get_session_factory()()
+
 
 async def get_async_db():
     async with AsyncSessionLocal() as session:
         try:
             yield session
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
+
+
+REPLICA_URLS = [url.strip() for url in settings.database_replica_urls.split(",") if url.strip()]
+
+
+class ReplicaRouter:
+    """Распределяет чтения по репликам round-robin.
+
+    Реплика, на которой не удалось получить соединение, исключается на replica_retry_seconds;
+    исчерпанный пул только учитывается в replica_failures, и чтение уходит на следующую реплику или primary.
+    Пользователь, недавно писавший в БД, читает с primary (read-your-writes), пока реплики догоняют.
+    """
+
+    def __init__(self, urls: List[str]):
+        self.urls = urls
+        self._counter = itertools.count()
+        self._factories: Dict[int, async_sessionmaker] = {}
+        self._down_until: Dict[int, float] = {}
+        self._recent_writes: Dict[int, float] = {}
+        self.stats = {
+            "replica_reads": [0] * len(urls),
+            "replica_failures": [0] * len(urls),
+            "primary_fallbacks": 0,
+            "read_your_writes": 0,
+        }
+
+    def session_factory(self, index: int) -> async_sessionmaker:
+        if index not in self._factories:
+            engine = create_async_engine(
+                _async_url(self.urls[index]), **_engine_options(is_async=True, url=self.urls[index])
+            )
+            self._factories[index] = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+        return self._factories[index]
+
+    def engines(self):
+        """Уже созданные движки реплик"""
+        return [(index, factory.kw["bind"]) for index, factory in self._factories.items()]
+
+    def mark_write(self, user_id: int):
+        now = time.monotonic()
+        self._recent_writes[user_id] = now + settings.read_your_writes_seconds
+        # Периодически выбрасываем истекшие отметки, чтобы словарь не рос бесконечно
+        if len(self._recent_writes) > 10000:
+            self._recent_writes = {key: until for key, until in self._recent_writes.items() if until > now}
+
+    def wrote_recently(self, user_id: Optional[int]) -> bool:
+        until = self._recent_writes.get(user_id)
+        return until is not None and until > time.monotonic()
+
+    def healthy_replicas(self) -> List[int]:
+        now = time.monotonic()
+        start = next(self._counter)
+        candidates = [(start + offset) % len(self.urls) for offset in range(len(self.urls))]
+        return [index for index in candidates if self._down_until.get(index, 0) <= now]
+
+    def record_failure(self, index: int):
+        self.stats["replica_failures"][index] += 1
+
+    def mark_down(self, index: int):
+        self.record_failure(index)
+        self._down_until[index] = time.monotonic() + settings.replica_retry_seconds
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        return {
+            **self.stats,
+            "replicas_down": [index for index, until in self._down_until.items() if until > now],
+        }
+
+
+replica_router = ReplicaRouter(REPLICA_URLS)
+
+
+async def get_read_session(user_id: Optional[int] = None):
+    """Сессия только для чтения: реплика, если она доступна, иначе primary"""
+    if replica_router.urls and not replica_router.wrote_recently(user_id):
+        for index in replica_router.healthy_replicas():
+            session = replica_router.session_factory(index)()
+            try:
+                # Проверяем соединение сразу, чтобы при недоступной реплике уйти на следующую
+                await session.connection()
+            except exc.TimeoutError:
+                # Пул реплики исчерпан: сама реплика жива, поэтому не исключаем ее на replica_retry_seconds
+                await session.close()
+                replica_router.record_failure(index)
+                continue
+            except (exc.DBAPIError, OSError):
+                await session.close()
+                replica_router.mark_down(index)
+                continue
+            replica_router.stats["replica_reads"][index] += 1
+            try:
+                yield session
+            finally:
+                await session.close()
+            return
+        replica_router.stats["primary_fallbacks"] += 1
+    elif replica_router.urls:
+        replica_router.stats["read_your_writes"] += 1
+
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+async def dispose_engines():
+    """Закрывает пулы созданных движков при остановке приложения"""
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
+    for _, engine in replica_router.engines():
+        await engine.dispose()
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+
+
+def _pool_stats(pool) -> dict:
+    stats = {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": settings.db_max_overflow,
+    }
+    wait_time = getattr(pool, "wait_time", None)
+    if wait_time is not None:
+        stats["timeouts"] = pool.timeouts
+        stats["wait_time"] = wait_time.snapshot()
+    return stats
+
+
+def pool_stats() -> dict:
+    """Состояние пулов соединений для подбора числа воркеров под max_connections"""
+    stats = {}
+    if get_engine.cache_info().currsize:
+        stats["sync"] = _pool_stats(get_engine().pool)
+    if get_async_engine.cache_info().currsize:
+        stats["async"] = _pool_stats(get_async_engine().pool)
+    for index, engine in replica_router.engines():
+        stats[f"replica_{index}"] = _pool_stats(engine.pool)
+    return stats
@@ -0,0 +1,21 @@
+import logging
+
+from .config import settings
+
+# Логгеры запросов к OpenAI пишут в общий файл
+AI_LOGGERS = ("app.routers.chatgpt_api", "app.routers.draft_api")
+
+_ai_file_handler = None
+
+
+def setup_ai_logging():
+    """Один файловый обработчик на процесс, повторный вызов ничего не делает"""
+    global _ai_file_handler
+    if _ai_file_handler is not None:
+        return
+    _ai_file_handler = logging.FileHandler(settings.ai_log_file)
+    _ai_file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    for name in AI_LOGGERS:
+        logger = logging.getLogger(name)
+        logger.setLevel(logging.INFO)
+        logger.addHandler(_ai_file_handler)
@@ -1,11 +1,19 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-import subprocess
-import os
+import asyncio
 from contextlib import asynccontextmanager
 
-from .database import engine, Base
-from .routers import auth, company, chatgpt_api, create_post
+from .compression import CompressionMiddleware
+from .config import settings
+from .database import dispose_engines
+from .log_config import setup_ai_logging
+from .routers import analytics, auth, company, chatgpt_api, create_post, draft_api, internal, media
+from .utils.hashing import shutdown_executor
+from .utils import images
+from .utils.llm import close_openai_client
+from .utils.migrations import run_migrations
+from .utils.scheduler import publish_scheduler
+from .utils.jobs import job_queue
 
 # Удаляем создание таблиц через SQLAlchemy - теперь будем использовать миграции
 # Base.metadata.create_all(bind=engine)
@@ -13,19 +21,39 @@ from .routers import auth, company, chatgpt_api, create_post
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Запускаем миграции при старте приложения
-    migrations_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrations")
-    alembic_ini = os.path.join(migrations_dir, "alembic.ini")
-    try:
+    # Тяжелые ресурсы (движки БД, клиенты OpenAI) создаются лениво при первом использовании
+    setup_ai_logging()
+    # Запускаем миграции при старте приложения: в этом же процессе, один воркер под advisory lock
+    if settings.run_migrations_on_startup:
         print("Applying database migrations...")
-        subprocess.run(["alembic", "-c", alembic_ini, "upgrade", "head"], check=True)
-        print("Migrations completed successfully!")
-    except Exception as e:
-        print(f"Error applying migrations: {e}")
+        # Ошибка миграции останавливает старт воркера, а не оставляет его со старой схемой
+        if await asyncio.to_thread(run_migrations):
+            print("Migrations completed successfully!")
+        else:
+            print("Database schema is up to date")
+    if settings.scheduler_enabled:
+        publish_scheduler.start()
+    if settings.jobs_worker_enabled:
+        job_queue.start()
     yield
+    # Незавершенные задания возвращаются в очередь и достанутся другим воркерам
+    await job_queue.stop()
+    await publish_scheduler.stop()
+    shutdown_executor()
+    images.shutdown_executor()
+    await close_openai_client()
+    await dispose_engines()
 
 app = FastAPI(title="AI-маркетолог API", lifespan=lifespan)
 
+if settings.compression_minimum_size > 0:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+    )
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # В продакшене нужно указать конкретные домены
@@ -37,7 +65,11 @@ app.add_middleware(
 app.include_router(auth.router)
 app.include_router(company.router)
 app.include_router(chatgpt_api.router)
+app.include_router(draft_api.router)
 app.include_router(create_post.router)
+app.include_router(analytics.router)
+app.include_router(media.router)
+app.include_router(internal.router)
 
 @app.get("/")
 async def root():
@@ -1 +1 @@
-from .models import User, Company, SocialMediaAccount, Post 
\ No newline at end of file
+from .models import User, Company, SocialMediaAccount, Post, RevokedToken, PostDailyStat, PostHashtagStat, PostSimilarityBand, GenerationCacheEntry, GenerationJob 
\ No newline at end of file
@@ -1,17 +1,21 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Text, JSON
+from sqlalchemy import BigInteger, Boolean, Column, Computed, Date, ForeignKey, Index, Integer, LargeBinary, SmallInteger, String, DateTime, Text, JSON, Float
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 import datetime
 
 from ..database import Base
 
 class User(Base):
     __tablename__ = "users"
+    # Значения по умолчанию из БД возвращаются через RETURNING, без отдельного SELECT после записи
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     is_active = Column(Boolean, default=True)
+    is_admin = Column(Boolean, default=False, server_default="false")
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
@@ -21,6 +25,10 @@ class User(Base):
 
 class Company(Base):
     __tablename__ = "companies"
+    __table_args__ = (
+        Index("ix_companies_user_id", "user_id"),
+    )
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
@@ -52,8 +60,43 @@ class SocialMediaAccount(Base):
 
     user = relationship("User", back_populates="social_accounts")
 
+# Конфигурации полнотекстового поиска PostgreSQL и значения Post.language, которые им соответствуют
+SEARCH_CONFIGS = {
+    "russian": ("ru", "rus", "russian", "русский"),
+    "english": ("en", "eng", "english", "английский"),
+}
+
+SEARCH_CONFIG_SQL = "CASE {} ELSE 'simple'::regconfig END".format(
+    " ".join(
+        "WHEN lower(language) IN ({}) THEN '{}'::regconfig".format(", ".join(f"'{alias}'" for alias in aliases), config)
+        for config, aliases in SEARCH_CONFIGS.items()
+    )
+)
+
+# Веса: заголовок важнее хештегов, хештеги важнее описания
+SEARCH_VECTOR_SQL = (
+    f"setweight(to_tsvector({SEARCH_CONFIG_SQL}, coalesce(title, '')), 'A') || "
+    "setweight(jsonb_to_tsvector('simple', coalesce(hashtags, '[]'::jsonb), '[\"string\"]'), 'B') || "
+    f"setweight(to_tsvector({SEARCH_CONFIG_SQL}, coalesce(description, '')), 'C')"
+)
+
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        # Список постов пользователя: фильтр по user_id и keyset-сортировка по (created_at, id)
+        Index("ix_posts_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Планировщик ищет только неопубликованные посты с назначенным временем
+        Index(
+            "ix_posts_scheduled_at_unpublished",
+            "scheduled_at",
+            postgresql_where=text("scheduled_at IS NOT NULL AND NOT is_published"),
+        ),
+        Index("ix_posts_search_vector", "search_vector", postgresql_using="gin"),
+        # jsonb_path_ops достаточно для фильтра hashtags @> '["#тег"]'
+        Index("ix_posts_hashtags", "hashtags", postgresql_using="gin", postgresql_ops={"hashtags": "jsonb_path_ops"}),
+    )
+    # search_vector вычисляет PostgreSQL; в ORM он не загружается и не возвращается после INSERT
+    __mapper_args__ = {"eager_defaults": True, "exclude_properties": ["search_vector"]}
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -66,15 +109,115 @@ class Post(Base):
     title = Column(String)
     description = Column(Text)
     benefits = Column(JSON)  # Список преимуществ
-    hashtags = Column(JSON)  # Список хештегов
+    hashtags = Column(JSON().with_variant(JSONB(), "postgresql"))  # Список хештегов
     image_prompt = Column(Text)
-    image_base64 = Column(Text)  # Изображение в base64
+    image_base64 = Column(Text)  # Устарело: изображения переносятся в blob store (image_hash)
+    image_hash = Column(String(64), nullable=True, index=True)  # sha256 изображения в blob store
+    thumbnails = Column(JSON, nullable=True)  # {"256": sha256, ...} миниатюры для списков
+    minhash = Column(LargeBinary, nullable=True)  # MinHash-сигнатура заголовка и описания (utils/minhash.py)
     
     # Метаданные
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     is_published = Column(Boolean, default=False)
     published_at = Column(DateTime(timezone=True), nullable=True)
+    scheduled_at = Column(DateTime(timezone=True), nullable=True)  # Отложенная публикация
+
+    # Поисковый вектор по заголовку, хештегам и описанию с учетом языка поста
+    search_vector = Column(TSVECTOR, Computed(SEARCH_VECTOR_SQL, persisted=True))
     
     # Связи
-    user = relationship("User", back_populates="posts") 
+    user = relationship("User", back_populates="posts")
+
+    @property
+    def image_url(self):
+        # Ссылка на изображение в blob store (эндпоинт /media или CDN)
+        from ..utils.blob_store import media_url
+        return media_url(self.image_hash)
+
+    @property
+    def thumbnail_url(self):
+        # Самая маленькая миниатюра, для старых постов без миниатюр - само изображение
+        from ..utils.blob_store import media_url
+        if self.thumbnails:
+            return media_url(self.thumbnails[min(self.thumbnails, key=int)])
+        return media_url(self.image_hash)
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    revoked_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+# Агрегаты для аналитики обновляются инкрементально при записи постов (repositories/analytics.py),
+# company_name "" - посты без названия компании
+class PostDailyStat(Base):
+    __tablename__ = "post_daily_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    company_name = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    created_count = Column(Integer, nullable=False, default=0)
+    published_count = Column(Integer, nullable=False, default=0)
+
+class PostHashtagStat(Base):
+    __tablename__ = "post_hashtag_stats"
+    __table_args__ = (
+        # Топ хештегов компании
+        Index("ix_post_hashtag_stats_top", "user_id", "company_name", "post_count"),
+    )
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    company_name = Column(String, primary_key=True)
+    hashtag = Column(String, primary_key=True)
+    post_count = Column(Integer, nullable=False, default=0)
+
+# LSH-индекс похожих постов: по корзине на каждую полосу MinHash-сигнатуры поста
+class PostSimilarityBand(Base):
+    __tablename__ = "post_similarity_bands"
+    __table_args__ = (
+        Index("ix_post_similarity_bands_lookup", "user_id", "company_name", "band", "bucket"),
+    )
+
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    band = Column(SmallInteger, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    company_name = Column(String, nullable=False)
+    bucket = Column(BigInteger, nullable=False)
+
+# Кеш ответов генерации: ключ - sha256 от версии промпта, модели, температуры и входных данных
+class GenerationCacheEntry(Base):
+    __tablename__ = "generation_cache"
+
+    key = Column(String(64), primary_key=True)
+    kind = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    cost_usd = Column(Float, nullable=False, default=0.0)  # Оценка стоимости генерации, которую экономит попадание
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+# Очередь фоновых генераций: queued -> running -> succeeded | failed.
+# locked_until - аренда задания воркером; задание упавшего воркера после ее окончания захватывается снова
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+    __table_args__ = (
+        Index("ix_generation_jobs_user_id_id", "user_id", "id"),
+        Index("ix_generation_jobs_pending", "id", postgresql_where=text("status IN ('queued', 'running')")),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind = Column(String, nullable=False)
+    params = Column(JSON, nullable=False)
+    status = Column(String, nullable=False, default="queued")
+    result = Column(JSON, nullable=True)
+    error = Column(JSON, nullable=True)  # {"status_code": ..., "detail": ...}, как у HTTP-ошибок AI-эндпоинтов
+    attempts = Column(Integer, nullable=False, default=0)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __mapper_args__ = {"eager_defaults": True}
@@ -0,0 +1 @@
+from . import users, companies, posts, revoked_tokens
@@ -0,0 +1,187 @@
+from collections import Counter
+from datetime import date, datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import Date, Integer, String, case, cast, delete, func, literal_column, select, text, true
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import Post, PostDailyStat, PostHashtagStat
+
+# Функции записи не коммитят: агрегаты обновляются в той же транзакции, что и посты
+
+
+def _company(company_name: Optional[str]) -> str:
+    return company_name or ""
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _normalize_hashtag(hashtag: str) -> str:
+    hashtag = hashtag.strip().lower()
+    return hashtag if hashtag.startswith("#") else f"#{hashtag}"
+
+
+async def _upsert_daily(db: AsyncSession, user_id: int, column: str, counts: Counter):
+    if not counts:
+        return
+    # Строки в одном порядке во всех транзакциях, чтобы параллельные upsert не взаимоблокировались
+    rows = [
+        {"user_id": user_id, "company_name": company_name, "day": day, "created_count": 0, "published_count": 0, column: count}
+        for (company_name, day), count in sorted(counts.items())
+    ]
+    statement = insert(PostDailyStat).values(rows)
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=["user_id", "company_name", "day"],
+            set_={column: getattr(PostDailyStat, column) + getattr(statement.excluded, column)},
+        )
+    )
+
+
+async def record_posts_created(db: AsyncSession, user_id: int, posts: Iterable[dict]):
+    """Учитывает новые посты (значения company_name и hashtags) в дневных счетчиках и частотах хештегов"""
+    today = _today()
+    daily = Counter()
+    hashtags = Counter()
+    for values in posts:
+        company_name = _company(values.get("company_name"))
+        daily[(company_name, today)] += 1
+        # Хештег считается один раз на пост
+        for hashtag in {_normalize_hashtag(tag) for tag in values.get("hashtags") or [] if tag and tag.strip("# ")}:
+            hashtags[(company_name, hashtag)] += 1
+
+    await _upsert_daily(db, user_id, "created_count", daily)
+    if hashtags:
+        rows = [
+            {"user_id": user_id, "company_name": company_name, "hashtag": hashtag, "post_count": count}
+            for (company_name, hashtag), count in sorted(hashtags.items())
+        ]
+        statement = insert(PostHashtagStat).values(rows)
+        await db.execute(
+            statement.on_conflict_do_update(
+                index_elements=["user_id", "company_name", "hashtag"],
+                set_={"post_count": PostHashtagStat.post_count + statement.excluded.post_count},
+            )
+        )
+
+
+async def record_posts_published(db: AsyncSession, published: Iterable[Tuple[int, Optional[str]]]):
+    """Учитывает публикации (user_id, company_name) в счетчике текущего дня"""
+    today = _today()
+    by_user = {}
+    for user_id, company_name in published:
+        by_user.setdefault(user_id, Counter())[(_company(company_name), today)] += 1
+    for user_id in sorted(by_user):
+        await _upsert_daily(db, user_id, "published_count", by_user[user_id])
+
+
+async def list_daily_stats(
+    db: AsyncSession,
+    user_id: int,
+    company_name: Optional[str],
+    date_from: date,
+    date_to: date,
+) -> List[Tuple[date, int, int]]:
+    """(день, создано, опубликовано) за [date_from, date_to]; без company_name - по всем компаниям"""
+    query = (
+        select(
+            PostDailyStat.day,
+            func.sum(PostDailyStat.created_count),
+            func.sum(PostDailyStat.published_count),
+        )
+        .where(PostDailyStat.user_id == user_id, PostDailyStat.day >= date_from, PostDailyStat.day <= date_to)
+        .group_by(PostDailyStat.day)
+        .order_by(PostDailyStat.day)
+    )
+    if company_name is not None:
+        query = query.where(PostDailyStat.company_name == company_name)
+    result = await db.execute(query)
+    return [(day, int(created), int(published)) for day, created, published in result.all()]
+
+
+async def list_top_hashtags(
+    db: AsyncSession, user_id: int, company_name: Optional[str], limit: int
+) -> List[Tuple[str, int]]:
+    if company_name is not None:
+        query = (
+            select(PostHashtagStat.hashtag, PostHashtagStat.post_count)
+            .where(PostHashtagStat.user_id == user_id, PostHashtagStat.company_name == company_name)
+            .order_by(PostHashtagStat.post_count.desc(), PostHashtagStat.hashtag)
+            .limit(limit)
+        )
+    else:
+        total = func.sum(PostHashtagStat.post_count)
+        query = (
+            select(PostHashtagStat.hashtag, total)
+            .where(PostHashtagStat.user_id == user_id)
+            .group_by(PostHashtagStat.hashtag)
+            .order_by(total.desc(), PostHashtagStat.hashtag)
+            .limit(limit)
+        )
+    result = await db.execute(query)
+    return [(hashtag, int(count)) for hashtag, count in result.all()]
+
+
+async def rebuild_rollups(db: AsyncSession):
+    """Пересчитывает агрегаты по таблице posts целиком (разовый backfill)"""
+    # Записи постов ждут снятия блокировки, поэтому их инкременты не теряются и не считаются дважды
+    await db.execute(text("LOCK TABLE post_daily_stats, post_hashtag_stats IN EXCLUSIVE MODE"))
+    await db.execute(delete(PostDailyStat))
+    await db.execute(delete(PostHashtagStat))
+
+    # Константы без bind-параметров: выражения в SELECT и GROUP BY должны совпадать текстуально
+    utc = literal_column("'UTC'", String)
+    zero = literal_column("0", Integer)
+    company = func.coalesce(Post.company_name, literal_column("''", String))
+    created_day = cast(func.timezone(utc, Post.created_at), Date)
+    published_day = cast(func.timezone(utc, Post.published_at), Date)
+
+    await db.execute(
+        insert(PostDailyStat).from_select(
+            ["user_id", "company_name", "day", "created_count", "published_count"],
+            select(Post.user_id, company, created_day, func.count(), zero)
+            .where(Post.user_id.is_not(None), Post.created_at.is_not(None))
+            .group_by(Post.user_id, company, created_day),
+        )
+    )
+    published = (
+        select(Post.user_id, company, published_day, zero, func.count())
+        .where(Post.user_id.is_not(None), Post.is_published.is_(True), Post.published_at.is_not(None))
+        .group_by(Post.user_id, company, published_day)
+    )
+    statement = insert(PostDailyStat).from_select(
+        ["user_id", "company_name", "day", "created_count", "published_count"], published
+    )
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=["user_id", "company_name", "day"],
+            set_={"published_count": statement.excluded.published_count},
+        )
+    )
+
+    # Хештеги разворачиваются через jsonb_array_elements_text; не-массивы считаются пустыми
+    hashtags_array = case(
+        (func.jsonb_typeof(Post.hashtags) == "array", Post.hashtags),
+        else_=cast("[]", JSONB),
+    )
+    tag = func.jsonb_array_elements_text(hashtags_array).table_valued("value").render_derived(name="tag")
+    hashtag = func.lower(func.btrim(tag.c.value))
+    hashtag = case((hashtag.startswith("#"), hashtag), else_="#" + hashtag)
+    per_post = (
+        select(Post.id, Post.user_id, company.label("company_name"), hashtag.label("hashtag"))
+        .select_from(Post)
+        .join(tag, true())
+        .where(Post.user_id.is_not(None), func.btrim(tag.c.value, "# ") != "")
+        .distinct()
+        .subquery()
+    )
+    await db.execute(
+        insert(PostHashtagStat).from_select(
+            ["user_id", "company_name", "hashtag", "post_count"],
+            select(per_post.c.user_id, per_post.c.company_name, per_post.c.hashtag, func.count())
+            .group_by(per_post.c.user_id, per_post.c.company_name, per_post.c.hashtag),
+        )
+    )
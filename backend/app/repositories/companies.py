@@ -0,0 +1,36 @@
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import Company
+
+
+async def list_user_companies(db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100) -> List[Company]:
+    result = await db.execute(
+        select(Company).where(Company.user_id == user_id).offset(skip).limit(limit)
+    )
+    return list(result.scalars().all())
+
+
+async def get_company(db: AsyncSession, company_id: int) -> Optional[Company]:
+    return await db.get(Company, company_id)
+
+
+async def create_company(db: AsyncSession, user_id: int, values: dict) -> Company:
+    company = Company(user_id=user_id, **values)
+    db.add(company)
+    await db.commit()
+    return company
+
+
+async def update_company(db: AsyncSession, company: Company, values: dict) -> Company:
+    for key, value in values.items():
+        setattr(company, key, value)
+    await db.commit()
+    return company
+
+
+async def delete_company(db: AsyncSession, company: Company):
+    await db.delete(company)
+    await db.commit()
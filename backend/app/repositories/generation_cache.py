@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+from typing import Any, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import GenerationCacheEntry
+
+
+async def get_entry(db: AsyncSession, key: str) -> Optional[Tuple[Any, float, datetime]]:
+    """(payload, cost_usd, expires_at) неистекшей записи"""
+    result = await db.execute(
+        select(GenerationCacheEntry.payload, GenerationCacheEntry.cost_usd, GenerationCacheEntry.expires_at).where(
+            GenerationCacheEntry.key == key,
+            GenerationCacheEntry.expires_at > datetime.now(timezone.utc),
+        )
+    )
+    row = result.first()
+    return tuple(row) if row else None
+
+
+async def put_entry(db: AsyncSession, key: str, kind: str, payload: Any, cost_usd: float, expires_at: datetime):
+    """Сохраняет запись; повторная генерация (fresh) перезаписывает старую"""
+    values = {"key": key, "kind": kind, "payload": payload, "cost_usd": cost_usd, "expires_at": expires_at}
+    query = insert(GenerationCacheEntry).values(values)
+    await db.execute(
+        query.on_conflict_do_update(
+            index_elements=["key"],
+            set_={
+                "payload": query.excluded.payload,
+                "cost_usd": query.excluded.cost_usd,
+                "created_at": datetime.now(timezone.utc),
+                "expires_at": query.excluded.expires_at,
+            },
+        )
+    )
+    await db.commit()
+
+
+async def delete_expired(db: AsyncSession) -> int:
+    result = await db.execute(
+        delete(GenerationCacheEntry).where(GenerationCacheEntry.expires_at <= datetime.now(timezone.utc))
+    )
+    await db.commit()
+    return result.rowcount
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import GenerationJob
+
+PENDING_STATUSES = ("queued", "running")
+
+
+async def create_job(db: AsyncSession, user_id: int, kind: str, params: Dict[str, Any]) -> GenerationJob:
+    job = GenerationJob(user_id=user_id, kind=kind, params=params, status="queued", attempts=0)
+    db.add(job)
+    await db.commit()
+    return job
+
+
+async def count_pending_jobs(db: AsyncSession, user_id: int) -> int:
+    result = await db.execute(
+        select(func.count()).select_from(GenerationJob).where(
+            GenerationJob.user_id == user_id, GenerationJob.status.in_(PENDING_STATUSES)
+        )
+    )
+    return result.scalar()
+
+
+async def get_user_job(db: AsyncSession, user_id: int, job_id: int) -> Optional[GenerationJob]:
+    result = await db.execute(
+        select(GenerationJob).where(GenerationJob.id == job_id, GenerationJob.user_id == user_id)
+    )
+    return result.scalars().first()
+
+
+async def claim_job(db: AsyncSession, now: datetime, lease_seconds: float, max_attempts: int) -> Optional[GenerationJob]:
+    """Захватывает старейшее задание: новое или брошенное упавшим воркером (аренда истекла).
+
+    SKIP LOCKED позволяет воркерам всех процессов разбирать очередь параллельно, не дожидаясь друг друга.
+    Брошенные задания, исчерпавшие max_attempts, завершаются ошибкой, а не захватываются снова.
+    """
+    abandoned = and_(GenerationJob.status == "running", GenerationJob.locked_until < now)
+    await db.execute(
+        update(GenerationJob)
+        .where(abandoned, GenerationJob.attempts >= max_attempts)
+        .values(
+            status="failed",
+            error={"status_code": 500, "detail": "Job was interrupted too many times"},
+            finished_at=now,
+            locked_until=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    candidate = (
+        select(GenerationJob.id)
+        .where(or_(GenerationJob.status == "queued", abandoned))
+        .order_by(GenerationJob.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        update(GenerationJob)
+        .where(GenerationJob.id == candidate)
+        .values(
+            status="running",
+            attempts=GenerationJob.attempts + 1,
+            started_at=now,
+            locked_until=now + timedelta(seconds=lease_seconds),
+        )
+        .returning(GenerationJob)
+        .execution_options(synchronize_session=False)
+    )
+    job = result.scalars().first()
+    await db.commit()
+    return job
+
+
+async def finish_job(
+    db: AsyncSession,
+    job_id: int,
+    attempt: int,
+    now: datetime,
+    result: Optional[Dict[str, Any]] = None,
+    error: Optional[Dict[str, Any]] = None,
+) -> bool:
+    """Сохраняет результат; False, если задание уже перехвачено другим воркером после истечения аренды"""
+    query = await db.execute(
+        update(GenerationJob)
+        .where(GenerationJob.id == job_id, GenerationJob.status == "running", GenerationJob.attempts == attempt)
+        .values(
+            status="failed" if error is not None else "succeeded",
+            result=result,
+            error=error,
+            finished_at=now,
+            locked_until=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return query.rowcount == 1
+
+
+async def release_job(db: AsyncSession, job_id: int, attempt: int):
+    """Возвращает задание в очередь при остановке воркера; попытка не засчитывается"""
+    await db.execute(
+        update(GenerationJob)
+        .where(GenerationJob.id == job_id, GenerationJob.status == "running", GenerationJob.attempts == attempt)
+        .values(status="queued", attempts=GenerationJob.attempts - 1, started_at=None, locked_until=None)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
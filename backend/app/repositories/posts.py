@@ -0,0 +1,241 @@
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional, Tuple
+
+from sqlalchemy import Float, cast, func, insert, literal_column, select, tuple_, type_coerce, update
+from sqlalchemy.dialects.postgresql import JSONB, REGCONFIG
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+
+from ..models.models import Post, SEARCH_CONFIGS
+from . import analytics as analytics_repo
+from . import similarity as similarity_repo
+from ..utils import minhash
+
+
+def _with_minhash(values: dict) -> dict:
+    sig = minhash.post_signature(values.get("title"), values.get("description"))
+    return {**values, "minhash": minhash.pack(sig) if sig else None}
+
+
+async def create_post(db: AsyncSession, user_id: int, values: dict) -> Post:
+    post = Post(user_id=user_id, **_with_minhash(values))
+    db.add(post)
+    # id нужен для индекса похожих постов
+    await db.flush()
+    await similarity_repo.index_posts(db, user_id, [(post.id, post.company_name, post.minhash)])
+    await analytics_repo.record_posts_created(db, user_id, [values])
+    await db.commit()
+    return post
+
+
+async def create_posts_bulk(db: AsyncSession, user_id: int, rows: List[dict]) -> List[int]:
+    """Многострочный INSERT одной транзакцией; id возвращаются в порядке rows"""
+    if not rows:
+        return []
+    rows_with_minhash = [{**_with_minhash(values), "user_id": user_id} for values in rows]
+    result = await db.execute(
+        insert(Post).returning(Post.id, sort_by_parameter_order=True),
+        rows_with_minhash,
+    )
+    ids = list(result.scalars().all())
+    await similarity_repo.index_posts(
+        db, user_id, [(post_id, values.get("company_name"), values["minhash"]) for post_id, values in zip(ids, rows_with_minhash)]
+    )
+    await analytics_repo.record_posts_created(db, user_id, rows)
+    await db.commit()
+    return ids
+
+
+# Колонки для списка постов: тяжелые description, JSON-поля и изображение не загружаются
+LIST_COLUMNS = (
+    Post.id, Post.title, Post.image_hash, Post.thumbnails, Post.created_at, Post.updated_at,
+    Post.is_published, Post.published_at, Post.scheduled_at,
+)
+
+
+async def list_user_posts_page(
+    db: AsyncSession,
+    user_id: int,
+    limit: int,
+    after: Optional[Tuple[datetime, int]] = None,
+    is_published: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> List[Post]:
+    """Страница постов от новых к старым; keyset по (created_at, id), без OFFSET"""
+    query = (
+        select(Post)
+        .options(load_only(*LIST_COLUMNS))
+        .where(Post.user_id == user_id)
+        .order_by(Post.created_at.desc(), Post.id.desc())
+        .limit(limit)
+    )
+    if after is not None:
+        query = query.where(tuple_(Post.created_at, Post.id) < tuple_(*after))
+    if is_published is not None:
+        query = query.where(Post.is_published == is_published)
+    if created_from is not None:
+        query = query.where(Post.created_at >= created_from)
+    if created_to is not None:
+        query = query.where(Post.created_at < created_to)
+    result = await db.execute(query)
+    return list(result.scalars().all())
+
+
+def _search_query(text: str, language: Optional[str]):
+    """tsquery в конфигурации языка; если язык не указан или неизвестен - по всем конфигурациям"""
+    configs = list(SEARCH_CONFIGS)
+    if language:
+        configs = [config for config, aliases in SEARCH_CONFIGS.items() if language.lower() in aliases] or configs + ["simple"]
+    else:
+        configs.append("simple")
+    query = None
+    for config in configs:
+        part = func.websearch_to_tsquery(cast(config, REGCONFIG), text)
+        query = part if query is None else query.op("||")(part)
+    return query
+
+
+async def search_user_posts(
+    db: AsyncSession,
+    user_id: int,
+    limit: int,
+    text: Optional[str] = None,
+    hashtags: Optional[List[str]] = None,
+    language: Optional[str] = None,
+    after: Optional[Tuple[float, int]] = None,
+) -> List[Tuple[Post, float]]:
+    """Поиск по search_vector (GIN) и хештегам (GIN, jsonb @>) с ранжированием по ts_rank"""
+    search_vector = Post.__table__.c.search_vector
+    if text:
+        ts_query = _search_query(text, language)
+        rank = func.ts_rank(search_vector, ts_query)
+    else:
+        # Без текстового запроса порядок - от новых постов к старым
+        rank = literal_column("0.0", Float)
+
+    query = (
+        select(Post, rank.label("rank"))
+        .options(load_only(*LIST_COLUMNS))
+        .where(Post.user_id == user_id)
+        .order_by(rank.desc(), Post.id.desc())
+        .limit(limit)
+    )
+    if text:
+        query = query.where(search_vector.op("@@")(ts_query))
+    if hashtags:
+        query = query.where(Post.hashtags.op("@>")(type_coerce(hashtags, JSONB)))
+    if after is not None:
+        query = query.where(tuple_(rank, Post.id) < tuple_(*after))
+    result = await db.execute(query)
+    return [(post, float(post_rank)) for post, post_rank in result.all()]
+
+
+# Колонки выгрузки: устаревший image_base64 не читается, изображения отдаются ссылками
+EXPORT_COLUMNS = (
+    Post.id, Post.company_name, Post.business_type, Post.region, Post.language,
+    Post.title, Post.description, Post.benefits, Post.hashtags, Post.image_prompt, Post.image_hash, Post.thumbnails,
+    Post.created_at, Post.updated_at, Post.is_published, Post.published_at, Post.scheduled_at,
+)
+
+
+async def stream_user_posts(db: AsyncSession, user_id: int, chunk_size: int) -> AsyncIterator[List[Post]]:
+    """Все посты пользователя пачками по chunk_size через серверный курсор, без загрузки всей выборки в память"""
+    result = await db.stream_scalars(
+        select(Post)
+        .options(load_only(*EXPORT_COLUMNS))
+        .where(Post.user_id == user_id)
+        .order_by(Post.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    async for chunk in result.partitions():
+        yield chunk
+        # Отданные объекты больше не нужны, не держим их в identity map сессии
+        for post in chunk:
+            db.expunge(post)
+
+
+async def get_posts_by_ids(db: AsyncSession, user_id: int, post_ids: List[int]) -> List[Post]:
+    """Посты пользователя для списка (колонки LIST_COLUMNS) в порядке post_ids"""
+    if not post_ids:
+        return []
+    result = await db.execute(
+        select(Post).options(load_only(*LIST_COLUMNS)).where(Post.id.in_(post_ids), Post.user_id == user_id)
+    )
+    posts = {post.id: post for post in result.scalars().all()}
+    return [posts[post_id] for post_id in post_ids if post_id in posts]
+
+
+async def get_user_post(db: AsyncSession, user_id: int, post_id: int) -> Optional[Post]:
+    """Пост пользователя; чужие посты не возвращаются"""
+    result = await db.execute(
+        select(Post).where(Post.id == post_id, Post.user_id == user_id)
+    )
+    return result.scalars().first()
+
+
+async def publish_post(db: AsyncSession, post: Post) -> bool:
+    """Публикует пост; False, если он уже опубликован.
+
+    Проверка и запись - одним условным UPDATE: из параллельных запросов и планировщика публикацию
+    (и ее учет в аналитике) засчитывает только тот, чей UPDATE вернул строку.
+    """
+    result = await db.execute(
+        update(Post)
+        .where(Post.id == post.id, Post.is_published.is_(False))
+        .values(is_published=True, published_at=datetime.now(timezone.utc), scheduled_at=None)
+        .returning(Post.id)
+        .execution_options(synchronize_session=False)
+    )
+    published = result.first() is not None
+    if published:
+        await analytics_repo.record_posts_published(db, [(post.user_id, post.company_name)])
+    await db.commit()
+    return published
+
+
+async def schedule_post(db: AsyncSession, post: Post, scheduled_at: Optional[datetime]) -> Post:
+    """Назначает (или снимает при None) время отложенной публикации"""
+    post.scheduled_at = scheduled_at
+    await db.commit()
+    return post
+
+
+async def claim_due_posts(db: AsyncSession, now: datetime, limit: int) -> List[Tuple[int, int, datetime]]:
+    """Публикует до limit постов, время которых наступило; возвращает (id, user_id, scheduled_at).
+
+    SKIP LOCKED позволяет нескольким воркерам и узлам разбирать очередь параллельно:
+    строки, уже захваченные другой транзакцией, пропускаются, а не ждут.
+    Как и publish_post, снимает scheduled_at: у опубликованного поста нет отложенной публикации.
+    Прежнее время возвращается из подзапроса - по нему считается задержка публикации.
+    """
+    due = (
+        select(Post.id, Post.scheduled_at)
+        .where(Post.is_published.is_(False), Post.scheduled_at <= now)
+        .order_by(Post.scheduled_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .subquery()
+    )
+    result = await db.execute(
+        update(Post)
+        .where(Post.id == due.c.id)
+        .values(is_published=True, published_at=now, scheduled_at=None)
+        .returning(Post.id, Post.user_id, due.c.scheduled_at, Post.company_name)
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    await analytics_repo.record_posts_published(db, [(row.user_id, row.company_name) for row in rows])
+    await db.commit()
+    return [(row.id, row.user_id, row.scheduled_at) for row in rows]
+
+
+async def list_upcoming_schedule(db: AsyncSession, after: datetime, limit: int) -> List[Tuple[int, datetime]]:
+    """Ближайшие запланированные публикации (id, scheduled_at) после after"""
+    result = await db.execute(
+        select(Post.id, Post.scheduled_at)
+        .where(Post.is_published.is_(False), Post.scheduled_at > after)
+        .order_by(Post.scheduled_at)
+        .limit(limit)
+    )
+    return [tuple(row) for row in result.all()]
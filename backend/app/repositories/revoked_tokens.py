@@ -0,0 +1,42 @@
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import RevokedToken
+
+
+async def add_revoked_tokens(db: AsyncSession, tokens: Iterable[Tuple[str, datetime, Optional[int]]]):
+    """Добавляет (jti, expires_at, user_id) в денай-лист; повторный отзыв игнорируется"""
+    rows = [{"jti": jti, "expires_at": expires_at, "user_id": user_id} for jti, expires_at, user_id in tokens]
+    if not rows:
+        return
+    await db.execute(insert(RevokedToken).values(rows).on_conflict_do_nothing(index_elements=["jti"]))
+    await db.commit()
+
+
+async def is_token_revoked(db: AsyncSession, jti: str) -> bool:
+    result = await db.execute(select(RevokedToken.jti).where(RevokedToken.jti == jti))
+    return result.scalar() is not None
+
+
+async def list_revoked_since(db: AsyncSession, since: Optional[datetime]) -> List[Tuple[str, datetime]]:
+    """jti и время отзыва для еще не истекших токенов, отозванных после since"""
+    query = select(RevokedToken.jti, RevokedToken.revoked_at).where(
+        RevokedToken.expires_at > datetime.now(timezone.utc)
+    )
+    if since is not None:
+        query = query.where(RevokedToken.revoked_at > since)
+    result = await db.execute(query)
+    return [(row.jti, row.revoked_at) for row in result]
+
+
+async def delete_expired(db: AsyncSession) -> int:
+    """Истекшие токены и так невалидны, держать их в денай-листе незачем"""
+    result = await db.execute(
+        delete(RevokedToken).where(RevokedToken.expires_at <= datetime.now(timezone.utc))
+    )
+    await db.commit()
+    return result.rowcount
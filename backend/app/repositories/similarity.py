@@ -0,0 +1,64 @@
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import Post, PostSimilarityBand
+from ..utils import minhash
+
+
+async def index_posts(db: AsyncSession, user_id: int, posts: Iterable[Tuple[int, Optional[str], Optional[bytes]]]):
+    """Добавляет (post_id, company_name, сигнатура) в LSH-индекс; без коммита, в транзакции записи поста"""
+    rows = []
+    for post_id, company_name, packed in posts:
+        if packed is None:
+            continue
+        for band, bucket in enumerate(minhash.band_buckets(minhash.unpack(packed))):
+            rows.append({
+                "post_id": post_id,
+                "band": band,
+                "user_id": user_id,
+                "company_name": company_name or "",
+                "bucket": bucket,
+            })
+    if rows:
+        await db.execute(insert(PostSimilarityBand), rows)
+
+
+async def find_similar(
+    db: AsyncSession,
+    user_id: int,
+    company_name: Optional[str],
+    sig: List[int],
+    min_similarity: float,
+    limit: int,
+    exclude_id: Optional[int] = None,
+) -> List[Tuple[int, float]]:
+    """Похожие посты компании: (post_id, похожесть) по убыванию похожести.
+
+    Кандидаты - посты, совпавшие с сигнатурой хотя бы в одной полосе (индексный поиск),
+    поэтому проверяется лишь малая доля постов компании, а не все.
+    """
+    buckets = list(enumerate(minhash.band_buckets(sig)))
+    candidates = (
+        select(PostSimilarityBand.post_id)
+        .where(
+            PostSimilarityBand.user_id == user_id,
+            PostSimilarityBand.company_name == (company_name or ""),
+            tuple_(PostSimilarityBand.band, PostSimilarityBand.bucket).in_(buckets),
+        )
+        .distinct()
+    )
+    if exclude_id is not None:
+        candidates = candidates.where(PostSimilarityBand.post_id != exclude_id)
+    result = await db.execute(select(Post.id, Post.minhash).where(Post.id.in_(candidates.scalar_subquery())))
+
+    found = []
+    for post_id, packed in result.all():
+        if packed is None:
+            continue
+        score = minhash.similarity(sig, minhash.unpack(packed))
+        if score >= min_similarity:
+            found.append((post_id, score))
+    found.sort(key=lambda item: (-item[1], -item[0]))
+    return found[:limit]
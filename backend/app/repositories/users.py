@@ -0,0 +1,39 @@
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from ..models.models import User
+
+
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    """Пользователь по email вместе с компанией"""
+    result = await db.execute(
+        select(User).options(joinedload(User.company)).where(User.email == email)
+    )
+    return result.scalars().first()
+
+
+async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
+    """Пользователь по id вместе с компанией"""
+    result = await db.execute(
+        select(User).options(joinedload(User.company)).where(User.id == user_id)
+    )
+    return result.scalars().first()
+
+
+async def email_exists(db: AsyncSession, email: str) -> bool:
+    result = await db.execute(select(User.id).where(User.email == email).limit(1))
+    return result.scalar() is not None
+
+
+async def create_user(db: AsyncSession, email: str, hashed_password: str) -> User:
+    """Создание пользователя; связи заполняются сразу, ленивая загрузка в async недоступна"""
+    user = User(email=email, hashed_password=hashed_password)
+    db.add(user)
+    await db.commit()
+    # У нового пользователя компании еще нет
+    set_committed_value(user, "company", None)
+    return user
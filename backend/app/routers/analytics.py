@@ -0,0 +1,75 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import User as UserModel
+from ..repositories import analytics as analytics_repo
+from ..utils.auth import get_current_active_user, get_async_read_db
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["analytics"],
+)
+
+# Дашборды читают только агрегаты, поэтому стоимость запроса не зависит от числа постов
+MAX_DAYS = 366
+
+
+class DailyStat(BaseModel):
+    day: date
+    created: int
+    published: int
+
+
+class DailyStatsResponse(BaseModel):
+    days: List[DailyStat]
+    total_created: int
+    total_published: int
+    published_ratio: float
+
+
+class HashtagStat(BaseModel):
+    hashtag: str
+    posts: int
+
+
+@router.get("/daily", response_model=DailyStatsResponse)
+async def get_daily_stats(
+    company_name: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_user: UserModel = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Посты по дням и доля опубликованных (по умолчанию за последние 30 дней, UTC)"""
+    date_to = date_to or datetime.now(timezone.utc).date()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from позже date_to")
+    if (date_to - date_from).days >= MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Период не должен превышать {MAX_DAYS} дней")
+
+    rows = await analytics_repo.list_daily_stats(db, current_user.id, company_name, date_from, date_to)
+    total_created = sum(created for _, created, _ in rows)
+    total_published = sum(published for _, _, published in rows)
+    return {
+        "days": [{"day": day, "created": created, "published": published} for day, created, published in rows],
+        "total_created": total_created,
+        "total_published": total_published,
+        "published_ratio": total_published / total_created if total_created else 0.0,
+    }
+
+
+@router.get("/hashtags", response_model=List[HashtagStat])
+async def get_top_hashtags(
+    company_name: Optional[str] = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    current_user: UserModel = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Самые частые хештеги в постах пользователя или одной компании"""
+    rows = await analytics_repo.list_top_hashtags(db, current_user.id, company_name, limit)
+    return [{"hashtag": hashtag, "posts": count} for hashtag, count in rows]
@@ -1,18 +1,25 @@
 from datetime import timedelta
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
-from ..schemas import User, UserCreate, Token
+from ..database import get_async_db
+from ..repositories import users as users_repo
+from ..schemas import User, UserCreate, Token, TokenRevokeRequest, TokenRevokeResponse
 from ..models.models import User as UserModel
 from ..utils.auth import (
     authenticate_user,
     create_access_token,
-    get_password_hash,
-    get_current_active_user
+    get_password_hash_async,
+    get_current_active_user,
+    get_current_admin_user,
+    decode_access_token,
+    oauth2_scheme
 )
+from ..utils.principal_cache import principal_cache, token_digest
+from ..utils.revocation import revocation_list, expires_at_from_exp
+from ..utils.rate_limit import login_throttle, get_client_ip
 from ..config import settings
 
 router = APIRouter(
@@ -21,38 +28,32 @@ router = APIRouter(
 )
 
 @router.post("/register", response_model=User)
-async def register(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(UserModel).filter(UserModel.email == user.email).first()
-    if db_user:
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    if await users_repo.email_exists(db, user.email):
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = get_password_hash(user.password)
-    db_user = UserModel(email=user.email, hashed_password=hashed_password)
-
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-
-    # Получаем пользователя со всеми связями
-    user_with_relations = db.query(UserModel).options(
-        joinedload(UserModel.company)
-    ).filter(UserModel.id == db_user.id).first()
-
-    return user_with_relations
+    hashed_password = await get_password_hash_async(user.password)
+    return await users_repo.create_user(db, user.email, hashed_password)
 
 @router.post("/login", response_model=Token)
 async def login_for_access_token(
+    request: Request,
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    # Лимиты проверяются до запроса к БД и bcrypt, чтобы перебор паролей стоил микросекунды
+    await login_throttle.check(form_data.username, get_client_ip(request))
+
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
+        await login_throttle.record_failure(form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    await login_throttle.record_success(form_data.username)
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
@@ -61,10 +62,32 @@ async def login_for_access_token(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=User)
-async def read_users_me(current_user: UserModel = Depends(get_current_active_user), db: Session = Depends(get_db)):
-    # Получаем объект пользователя со всеми связями
-    user_with_company = db.query(UserModel).options(
-        joinedload(UserModel.company)
-    ).filter(UserModel.id == current_user.id).first()
+async def read_users_me(current_user: UserModel = Depends(get_current_active_user)):
+    # Пользователь уже загружен вместе с компанией в get_current_user
+    return current_user
 
-    return user_with_company
\ No newline at end of file
+@router.post("/logout")
+async def logout(
+    token: str = Depends(oauth2_scheme),
+    current_user: UserModel = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    payload = decode_access_token(token)
+    jti = payload.get("jti")
+    if jti is not None:
+        await revocation_list.revoke(db, [(jti, expires_at_from_exp(payload.get("exp")), current_user.id)])
+    principal_cache.invalidate_token(token_digest(token))
+    return {"message": "Successfully logged out"}
+
+@router.post("/revoke", response_model=TokenRevokeResponse)
+async def revoke_tokens(
+    request: TokenRevokeRequest,
+    admin: UserModel = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Массовый отзыв токенов по jti (только для администраторов)"""
+    # exp отзываемых токенов неизвестен, держим их в списке максимальное время жизни токена
+    expires_at = expires_at_from_exp(None)
+    jtis = set(request.jtis)
+    await revocation_list.revoke(db, [(jti, expires_at, None) for jti in jtis])
+    return {"revoked": len(jtis)}
@@ -1,44 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
-from openai import OpenAI, OpenAIError
-import openai
+from typing import List, Literal, Optional, Dict, Any
 import logging
 import json
 from datetime import datetime
 import base64
-import requests
+import asyncio
+from contextlib import asynccontextmanager
 
 from ..utils.auth import get_current_active_user
+from ..database import AsyncSessionLocal, get_read_session
 from ..models.models import User as UserModel
 from ..config import settings
+from ..utils.llm import chat_completion, chat_completion_stream, image_generation, image_slot, llm_http_exception, openai_error, record_image_timeout
+from ..utils.images import process_image
+from ..utils.blob_store import get_blob_store
+from ..utils import minhash
+from ..utils.generation_cache import cache_key, generation_cache
+from ..utils.sse import SSE_HEADERS, JsonStreamParser, sse_event
+from ..repositories import similarity as similarity_repo
+from ..repositories import users as users_repo
+from ..repositories import jobs as jobs_repo
+from ..utils.jobs import JobError, job_queue
 
-# Настройка логгера
+# Файловый обработчик подключается при старте приложения (app.log_config)
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-
-# Создаем форматтер для логов
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-
-# Создаем обработчик для записи в файл
-file_handler = logging.FileHandler('chatgpt_api.log')
-file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
 
 router = APIRouter(
     prefix="/ai-requests",
     tags=["ai-requests"],
 )
 
-# Проверка наличия API ключа
-if not settings.openai_api_key:
-    logger.error("OpenAI API key is not set! Please check .env.gpt file")
-    raise ValueError("OpenAI API key is not set! Please check .env.gpt file")
-
-# Инициализация клиента OpenAI
-client = OpenAI(api_key=settings.openai_api_key)
-logger.info(f"OpenAI API key loaded: {settings.openai_api_key[:8]}...")
+GENERATION_MODEL = "gpt-3.5-turbo"
+GENERATION_TEMPERATURE = 0.7
+IMAGE_MODEL = "dall-e-3"
+# Версии шаблонов промптов входят в ключ кеша генераций: изменили шаблон - увеличьте версию
+IDEAS_PROMPT_VERSION = 1
+POST_PROMPT_VERSION = 1
+IMAGE_PROMPT_VERSION = 1
 
 class Message(BaseModel):
     role: str = Field(..., description="Роль отправителя (user/assistant/system)")
@@ -68,6 +68,9 @@ class IdeaResponse(BaseModel):
     hashtags: List[str] = Field(..., description="Хештеги для соц. сетей")
     image_prompt: str = Field(..., description="Промпт для генерации изображения")
     image_base64: Optional[str] = Field(None, description="Изображение в формате base64")
+    is_duplicate: bool = Field(default=False, description="Почти повторяет сохраненный пост или другую идею")
+    duplicate_of_post_id: Optional[int] = Field(None, description="Похожий сохраненный пост компании")
+    similarity: Optional[float] = Field(None, description="Оценка похожести (0..1)")
 
 class PostResponse(BaseModel):
     title: str = Field(..., description="Заголовок поста")
@@ -78,6 +81,28 @@ class PostResponse(BaseModel):
 class IdeasGenerationResponse(BaseModel):
     ideas: List[IdeaResponse] = Field(..., description="Список идей")
 
+class JobCreateRequest(BaseModel):
+    kind: Literal["generate-ideas", "generate-post"] = Field(..., description="Что сгенерировать")
+    prompt: Optional[str] = Field(None, description="Промпт поста (для generate-post)")
+    with_images: bool = Field(default=False, description="Изображения для идей (для generate-ideas)")
+    fresh: bool = Field(default=False, description="Сгенерировать заново, не используя кеш")
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str = Field(..., description="queued, running, succeeded или failed")
+    attempts: int
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[Dict[str, Any]] = Field(None, description="Ответ generate-ideas или generate-post")
+    error: Optional[Dict[str, Any]] = Field(None, description="status_code и detail, как у HTTP-ошибки")
+
+    class Config:
+        from_attributes = True
+
+FINISHED_JOB_STATUSES = ("succeeded", "failed")
+
 def log_request(user_id: int, request_data: Any):
     """Логирование входящего запроса"""
     # Преобразуем Pydantic модель в словарь, если она передана
@@ -114,36 +139,74 @@ def log_error(user_id: int, error: Exception):
     }
     logger.error(f"ChatGPT Error: {json.dumps(log_data, ensure_ascii=False)}")
 
-async def generate_image(prompt: str) -> str:
-    """Генерация изображения через DALL-E"""
+def completion_cost(response) -> float:
+    """Оценка стоимости ответа ChatGPT по числу токенов"""
+    usage = getattr(response, "usage", None)
+    return tokens_cost(usage.total_tokens if usage else 0)
+
+def tokens_cost(tokens: int) -> float:
+    return tokens / 1000 * settings.generation_cost_per_1k_tokens
+
+async def _generate_image(prompt: str) -> bytes:
+    # Изображение приходит сразу в ответе (b64_json), без отдельного скачивания по URL
+    response = await image_generation(
+        model=IMAGE_MODEL,
+        prompt=prompt,
+        size="1024x1024",
+        quality="standard",
+        response_format="b64_json",
+        n=1,
+    )
+    image = base64.b64decode(response.data[0].b64_json)
+
+    # PNG от DALL-E перекодируем в компактный формат в пуле процессов
+    processed = await process_image(image, thumbnails=False)
+    return processed["image"]
+
+async def generate_image(user_id: int, prompt: str, fresh: bool = False) -> Optional[str]:
+    """Генерация изображения через DALL-E; None, если не успели за таймаут или произошла ошибка"""
+    key = cache_key(
+        "image", IMAGE_PROMPT_VERSION, IMAGE_MODEL, 0.0,
+        prompt=prompt, image_format=settings.image_format, image_quality=settings.image_quality,
+    )
+    # Сами изображения лежат в blob store, в кеше - только их хеш; в памяти воркеров их не держим
+    cached = await generation_cache.get(key, fresh=fresh, memory=False)
+    if cached is not None and cached.get("image_hash"):
+        image = await get_blob_store().read(cached["image_hash"])
+        # Объект могли удалить из хранилища: тогда генерируем заново
+        if image is not None:
+            return base64.b64encode(image).decode('utf-8')
+
+    async def generate():
+        async with image_slot(user_id):
+            return await _generate_image(prompt)
+
     try:
-        response = client.images.generate(
-            model="dall-e-3",
-            prompt=prompt,
-            size="1024x1024",
-            quality="standard",
-            n=1,
-        )
-        image_url = response.data[0].url
-        
-        # Скачиваем изображение и конвертируем в base64
-        image_response = requests.get(image_url)
-        image_response.raise_for_status()
-        return base64.b64encode(image_response.content).decode('utf-8')
+        # Таймаут включает ожидание места в очереди: медленное изображение не задерживает весь ответ
+        image = await asyncio.wait_for(generate(), settings.image_generation_timeout_seconds)
+    except asyncio.TimeoutError:
+        record_image_timeout()
+        logger.error(f"Image generation timed out after {settings.image_generation_timeout_seconds}s")
+        return None
     except Exception as e:
         logger.error(f"Error generating image: {str(e)}")
         return None
+    image_hash = await get_blob_store().put(image)
+    await generation_cache.set(
+        key, "image", {"image_hash": image_hash}, settings.generation_cost_per_image, memory=False
+    )
+    return base64.b64encode(image).decode('utf-8')
 
-@router.post("/generate-ideas", response_model=IdeasGenerationResponse)
-async def generate_ideas(
-    current_user: UserModel = Depends(get_current_active_user)
-):
-    company = current_user.company
-    try:
-        # Логируем входящий запрос
-        
-        # Создаем промпт для генерации идей
-        prompt_template = f"""
+def ideas_prompt(company, count: int, avoid: List[str]) -> str:
+    """Промпт генерации идей; avoid - заголовки, которые нельзя повторять"""
+    avoid_block = ""
+    if avoid:
+        avoid_list = "\n".join(f"        - {title}" for title in avoid)
+        avoid_block = f"""
+        Эти идеи уже были, НЕ ПОВТОРЯЙ их и не предлагай похожие по смыслу:
+{avoid_list}
+        """
+    return f"""
         Ты - профессиональный бизнес-консультант по маркетингу. 
         
         Компания: {company.name}
@@ -151,8 +214,8 @@ async def generate_ideas(
         Регион: {company.region}
         Язык: Русский
         
-        Сгенерируй ТОП-3 маркетинговые идеи для постов в соц. сетях этой компании, которые помогут повысить узнаваемость бренда и привлечь новых клиентов.
-        
+        Сгенерируй ТОП-{count} маркетинговые идеи для постов в соц. сетях этой компании, которые помогут повысить узнаваемость бренда и привлечь новых клиентов.
+        {avoid_block}
         Для каждой идеи также:
         1. Добавь 5-7 релевантных хештегов для соц. сетей
         2. Создай промпт для генерации изображения, которое будет иллюстрировать идею
@@ -167,86 +230,209 @@ async def generate_ideas(
                     "hashtags": ["#хештег1", "#хештег2", ...],
                     "image_prompt": "Детальное описание изображения для генерации"
                 }},
-                ... (всего 3 идеи)
+                ... (всего {count} идеи)
             ]
         }}
         
         НЕ ДОБАВЛЯЙ никаких пояснений или дополнительного текста вне этой JSON структуры.
         """
-        
-        # Отправляем запрос к ChatGPT
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt_template}],
-            temperature=0.7,
-            response_format={"type": "json_object"}
+
+def ideas_cache_key(company, count: int, avoid: List[str]) -> str:
+    return cache_key(
+        "ideas", IDEAS_PROMPT_VERSION, GENERATION_MODEL, GENERATION_TEMPERATURE,
+        name=company.name, industry=company.industry, region=company.region, count=count, avoid=avoid,
+    )
+
+async def request_ideas(company, count: int, avoid: List[str], fresh: bool = False) -> List[Dict[str, Any]]:
+    """Запрос идей к ChatGPT; повторный запрос для неизменившейся компании берется из кеша"""
+    key = ideas_cache_key(company, count, avoid)
+    cached = await generation_cache.get(key, fresh=fresh)
+    if cached is not None:
+        return cached
+
+    response = await chat_completion(
+        model=GENERATION_MODEL,
+        messages=[{"role": "user", "content": ideas_prompt(company, count, avoid)}],
+        temperature=GENERATION_TEMPERATURE,
+        response_format={"type": "json_object"}
+    )
+    ideas = json.loads(response.choices[0].message.content)["ideas"]
+    await generation_cache.set(key, "ideas", ideas, completion_cost(response))
+    return ideas
+
+async def flag_duplicates(user_id: int, company_name: str, ideas: List[Dict[str, Any]], accepted: List[List[int]]):
+    """Помечает идеи, почти повторяющие посты компании или уже принятые идеи этого ответа.
+
+    accepted - сигнатуры принятых идей, дополняется неповторяющимися идеями.
+    Сессия БД открывается только на время поиска похожих постов: соединение не должно ждать генераций.
+    """
+    threshold = settings.similar_posts_min_similarity
+    signatures = [minhash.post_signature(idea.get("title"), idea.get("description")) for idea in ideas]
+    async with asynccontextmanager(get_read_session)(user_id) as db:
+        similar = [
+            await similarity_repo.find_similar(db, user_id, company_name, sig, threshold, 1) if sig else []
+            for sig in signatures
+        ]
+    for idea, sig, found in zip(ideas, signatures, similar):
+        idea.update(is_duplicate=False, duplicate_of_post_id=None, similarity=None)
+        if sig is None:
+            continue
+        if found:
+            idea.update(is_duplicate=True, duplicate_of_post_id=found[0][0], similarity=found[0][1])
+            continue
+        score = max((minhash.similarity(sig, other) for other in accepted), default=0.0)
+        if score >= threshold:
+            idea.update(is_duplicate=True, similarity=score)
+            continue
+        accepted.append(sig)
+
+async def regenerate_duplicates(
+    user_id: int, company, ideas: List[Dict[str, Any]], accepted: List[List[int]], fresh: bool
+) -> List[int]:
+    """Генерирует повторы заново с явным запретом повторять уже предложенное; возвращает замененные индексы"""
+    replaced = []
+    for _ in range(settings.ideas_dedup_regenerations):
+        duplicates = [index for index, idea in enumerate(ideas) if idea["is_duplicate"]]
+        if not duplicates:
+            break
+        avoid = [idea["title"] for idea in ideas]
+        replacements = (await request_ideas(company, len(duplicates), avoid, fresh))[:len(duplicates)]
+        await flag_duplicates(user_id, company.name, replacements, accepted)
+        for index, replacement in zip(duplicates, replacements):
+            # Замена, которая тоже оказалась повтором, не лучше исходной идеи
+            if not replacement["is_duplicate"]:
+                ideas[index] = replacement
+                replaced.append(index)
+    return replaced
+
+def generation_http_error(error: Exception) -> HTTPException:
+    """Ошибка генерации в виде HTTP-ответа - одинаково для обычных, потоковых ответов и фоновых заданий"""
+    if isinstance(error, HTTPException):
+        return error
+    if isinstance(error, openai_error()):
+        return llm_http_exception(error)
+    if isinstance(error, ValueError):
+        # json.JSONDecodeError и оборванный JSON из JsonStreamParser
+        return HTTPException(status_code=500, detail="Не удалось распарсить ответ от API в формате JSON")
+    return HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+
+def stream_error(user_id: int, error: Exception) -> bytes:
+    """Событие error вместо HTTP-ошибки: статус 200 уже отправлен вместе с началом потока"""
+    log_error(user_id, error)
+    http_error = generation_http_error(error)
+    return sse_event("error", {"status_code": http_error.status_code, "detail": http_error.detail})
+
+async def stream_ideas(user_id: int, company, with_images: bool, fresh: bool):
+    """SSE: idea - каждая идея, как только модель ее допишет (и замены повторов с тем же index),
+    image - изображения идей по готовности, done - итоговый ответ"""
+    try:
+        accepted = []
+        key = ideas_cache_key(company, 3, [])
+        ideas = await generation_cache.get(key, fresh=fresh)
+        if ideas is not None:
+            await flag_duplicates(user_id, company.name, ideas, accepted)
+            for index, idea in enumerate(ideas):
+                yield sse_event("idea", {"index": index, "idea": idea})
+        else:
+            ideas = []
+            parser = JsonStreamParser()
+            usage = {}
+            async for delta in chat_completion_stream(
+                usage,
+                model=GENERATION_MODEL,
+                messages=[{"role": "user", "content": ideas_prompt(company, 3, [])}],
+                temperature=GENERATION_TEMPERATURE,
+                response_format={"type": "json_object"},
+            ):
+                for path, value in parser.feed(delta):
+                    if len(path) == 2 and path[0] == "ideas":
+                        await flag_duplicates(user_id, company.name, [value], accepted)
+                        ideas.append(value)
+                        yield sse_event("idea", {"index": len(ideas) - 1, "idea": value})
+            # В кеш - ответ модели без флагов повторов: они зависят от текущих постов компании
+            await generation_cache.set(
+                key, "ideas", parser.result()["ideas"], tokens_cost(usage.get("total_tokens", 0))
+            )
+
+        for index in await regenerate_duplicates(user_id, company, ideas, accepted, fresh):
+            yield sse_event("idea", {"index": index, "idea": ideas[index]})
+
+        if with_images:
+            async def indexed_image(index: int, prompt: str):
+                return index, await generate_image(user_id, prompt, fresh)
+
+            for next_image in asyncio.as_completed(
+                [indexed_image(index, idea["image_prompt"]) for index, idea in enumerate(ideas)]
+            ):
+                index, image_base64 = await next_image
+                ideas[index]["image_base64"] = image_base64
+                yield sse_event("image", {"index": index, "image_base64": image_base64})
+
+        response_data = IdeasGenerationResponse(ideas=ideas)
+        log_response(user_id, response_data)
+        yield sse_event("done", response_data.model_dump())
+    except Exception as e:
+        yield stream_error(user_id, e)
+
+async def build_ideas(user_id: int, company, with_images: bool, fresh: bool) -> IdeasGenerationResponse:
+    """Идеи с пометками повторов и, по запросу, изображениями"""
+    ideas = await request_ideas(company, 3, [], fresh)
+    accepted = []
+    await flag_duplicates(user_id, company.name, ideas, accepted)
+    await regenerate_duplicates(user_id, company, ideas, accepted, fresh)
+
+    if with_images:
+        # Изображения всех идей генерируются одновременно: задержка - примерно как у одного изображения
+        images = await asyncio.gather(*(generate_image(user_id, idea["image_prompt"], fresh) for idea in ideas))
+        for idea, image_base64 in zip(ideas, images):
+            idea["image_base64"] = image_base64
+    ideas_data = {"ideas": ideas}
+    
+    # Формируем структурированный ответ
+    response_data = IdeasGenerationResponse(**ideas_data)
+    
+    # Логируем успешный ответ
+    log_response(user_id, ideas_data)
+    
+    return response_data
+
+@router.post("/generate-ideas", response_model=IdeasGenerationResponse)
+async def generate_ideas(
+    with_images: bool = Query(default=False, description="Сгенерировать изображения для идей"),
+    fresh: bool = Query(default=False, description="Сгенерировать заново, не используя кеш"),
+    stream: bool = Query(default=False, description="Отдавать идеи потоком (Server-Sent Events)"),
+    current_user: UserModel = Depends(get_current_active_user)
+):
+    company = current_user.company
+    if stream:
+        return StreamingResponse(
+            stream_ideas(current_user.id, company, with_images, fresh),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS,
         )
-        
-        # Получаем ответ и преобразуем его в JSON
-        response_content = response.choices[0].message.content
-        ideas_data = json.loads(response_content)
-        
-        # # Генерируем изображения для каждой идеи
-        # for idea in ideas_data["ideas"]:
-        #     image_base64 = await generate_image(idea["image_prompt"])
-        #     print(image_base64)
-        #     idea["image_base64"] = image_base64
-        
-        # Формируем структурированный ответ
-        response_data = IdeasGenerationResponse(**ideas_data)
-        
-        # Логируем успешный ответ
-        log_response(current_user.id, ideas_data)
-        
-        return response_data
-        
+    try:
+        return await build_ideas(current_user.id, company, with_images, fresh)
     except json.JSONDecodeError as e:
         log_error(current_user.id, e)
         raise HTTPException(
             status_code=500,
             detail="Не удалось распарсить ответ от API в формате JSON"
         )
-    except OpenAIError as e:
+    except openai_error() as e:
         # Логируем ошибку API
         log_error(current_user.id, e)
-        error_message = str(e)
-        
-        # Обработка различных типов ошибок
-        if "API key" in error_message:
-            raise HTTPException(
-                status_code=500,
-                detail="Invalid OpenAI API key. Please check your .env.gpt file"
-            )
-        elif "insufficient_quota" in error_message:
-            raise HTTPException(
-                status_code=429,
-                detail="OpenAI API quota exceeded. Please check your billing details at https://platform.openai.com/account/billing"
-            )
-        elif "rate_limit" in error_message:
-            raise HTTPException(
-                status_code=429,
-                detail="Rate limit exceeded. Please try again later"
-            )
-        raise HTTPException(status_code=500, detail=str(e))
+        raise llm_http_exception(e)
     except Exception as e:
         # Логируем неожиданные ошибки
         log_error(current_user.id, e)
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
 
-@router.post("/generate-post", response_model=PostResponse)
-async def generate_post(
-    request: PostGenerationRequest,
-    current_user: UserModel = Depends(get_current_active_user)
-):
-    try:
-        # Логируем входящий запрос
-        log_request(current_user.id, request)
-        
-        # Создаем промпт для генерации поста
-        prompt_template = f"""
+def post_prompt(prompt: str) -> str:
+    """Промпт генерации поста"""
+    return f"""
         Ты - профессиональный копирайтер и маркетолог.
         
-        На основе этого промпта: "{request.prompt}"
+        На основе этого промпта: "{prompt}"
         
         Создай привлекательный пост для социальных сетей, который привлечет внимание аудитории.
         
@@ -260,33 +446,98 @@ async def generate_post(
         
         НЕ ДОБАВЛЯЙ никаких пояснений или дополнительного текста вне этой JSON структуры.
         """
-        
+
+def post_cache_key(prompt: str) -> str:
+    return cache_key("post", POST_PROMPT_VERSION, GENERATION_MODEL, GENERATION_TEMPERATURE, prompt=prompt)
+
+# Поля поста, которые отдаются в потоке по мере готовности (image_prompt в ответ не входит)
+POST_STREAM_FIELDS = ("title", "description", "hashtags")
+
+async def stream_post(user_id: int, prompt: str, fresh: bool):
+    """SSE: field - поля поста по мере готовности, image - изображение, done - итоговый ответ"""
+    try:
+        key = post_cache_key(prompt)
+        post_data = await generation_cache.get(key, fresh=fresh)
+        if post_data is not None:
+            for name in POST_STREAM_FIELDS:
+                yield sse_event("field", {"name": name, "value": post_data.get(name)})
+        else:
+            parser = JsonStreamParser(max_depth=1)
+            usage = {}
+            async for delta in chat_completion_stream(
+                usage,
+                model=GENERATION_MODEL,
+                messages=[{"role": "user", "content": post_prompt(prompt)}],
+                temperature=GENERATION_TEMPERATURE,
+                response_format={"type": "json_object"},
+            ):
+                for (name,), value in parser.feed(delta):
+                    if name in POST_STREAM_FIELDS:
+                        yield sse_event("field", {"name": name, "value": value})
+            post_data = parser.result()
+            await generation_cache.set(key, "post", post_data, tokens_cost(usage.get("total_tokens", 0)))
+
+        image_base64 = await generate_image(user_id, post_data["image_prompt"], fresh)
+        yield sse_event("image", {"image_base64": image_base64})
+
+        post_data["image_base64"] = image_base64
+        post_data.pop("image_prompt", None)
+        response_data = PostResponse(**post_data)
+        log_response(user_id, post_data)
+        yield sse_event("done", response_data.model_dump())
+    except Exception as e:
+        yield stream_error(user_id, e)
+
+async def build_post(user_id: int, prompt: str, fresh: bool) -> PostResponse:
+    """Пост с изображением"""
+    key = post_cache_key(prompt)
+    post_data = await generation_cache.get(key, fresh=fresh)
+    if post_data is None:
         # Отправляем запрос к ChatGPT
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt_template}],
-            temperature=0.7,
+        response = await chat_completion(
+            model=GENERATION_MODEL,
+            messages=[{"role": "user", "content": post_prompt(prompt)}],
+            temperature=GENERATION_TEMPERATURE,
             response_format={"type": "json_object"}
         )
-        
+
         # Получаем ответ и преобразуем его в JSON
         response_content = response.choices[0].message.content
         post_data = json.loads(response_content)
-        
-        # Генерируем изображение на основе prompt
-        image_base64 = await generate_image(post_data["image_prompt"])
-        post_data["image_base64"] = image_base64
-        
-        # Удаляем поле image_prompt так как оно не требуется в ответе
-        post_data.pop("image_prompt", None)
-        
-        # Формируем структурированный ответ
-        response_data = PostResponse(**post_data)
-        
-        # Логируем успешный ответ
-        log_response(current_user.id, post_data)
-        
-        return response_data
+        await generation_cache.set(key, "post", post_data, completion_cost(response))
+
+    # Генерируем изображение на основе prompt (изображение кешируется отдельно, по своему промпту)
+    image_base64 = await generate_image(user_id, post_data["image_prompt"], fresh)
+    post_data["image_base64"] = image_base64
+
+    # Удаляем поле image_prompt так как оно не требуется в ответе
+    post_data.pop("image_prompt", None)
+
+    # Формируем структурированный ответ
+    response_data = PostResponse(**post_data)
+
+    # Логируем успешный ответ
+    log_response(user_id, post_data)
+
+    return response_data
+
+@router.post("/generate-post", response_model=PostResponse)
+async def generate_post(
+    request: PostGenerationRequest,
+    fresh: bool = Query(default=False, description="Сгенерировать заново, не используя кеш"),
+    stream: bool = Query(default=False, description="Отдавать пост потоком (Server-Sent Events)"),
+    current_user: UserModel = Depends(get_current_active_user)
+):
+    # Логируем входящий запрос
+    log_request(current_user.id, request)
+    if stream:
+        return StreamingResponse(
+            stream_post(current_user.id, request.prompt, fresh),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS,
+        )
+    try:
+        return await build_post(current_user.id, request.prompt, fresh)
         
     except json.JSONDecodeError as e:
         log_error(current_user.id, e)
@@ -294,29 +545,115 @@ async def generate_post(
             status_code=500,
             detail="Не удалось распарсить ответ от API в формате JSON"
         )
-    except OpenAIError as e:
+    except openai_error() as e:
         # Логируем ошибку API
         log_error(current_user.id, e)
-        error_message = str(e)
-        
-        # Обработка различных типов ошибок
-        if "API key" in error_message:
-            raise HTTPException(
-                status_code=500,
-                detail="Invalid OpenAI API key. Please check your .env.gpt file"
-            )
-        elif "insufficient_quota" in error_message:
-            raise HTTPException(
-                status_code=429,
-                detail="OpenAI API quota exceeded. Please check your billing details at https://platform.openai.com/account/billing"
-            )
-        elif "rate_limit" in error_message:
-            raise HTTPException(
-                status_code=429,
-                detail="Rate limit exceeded. Please try again later"
-            )
-        raise HTTPException(status_code=500, detail=str(e))
+        raise llm_http_exception(e)
     except Exception as e:
         # Логируем неожиданные ошибки
         log_error(current_user.id, e)
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+
+async def run_job(user_id: int, build) -> Dict[str, Any]:
+    try:
+        return (await build()).model_dump()
+    except Exception as e:
+        log_error(user_id, e)
+        http_error = generation_http_error(e)
+        raise JobError(http_error.status_code, http_error.detail)
+
+async def ideas_job(user_id: int, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Задание generate-ideas: то же, что POST /generate-ideas, но в воркере очереди"""
+    # Сессия закрывается до генерации: компания загружена вместе с пользователем и дальше не меняется
+    async with asynccontextmanager(get_read_session)(user_id) as db:
+        user = await users_repo.get_user_by_id(db, user_id)
+    if user is None or user.company is None:
+        raise JobError(400, "Сначала создайте компанию")
+    company = user.company
+    return await run_job(
+        user_id,
+        lambda: build_ideas(user_id, company, params.get("with_images", False), params.get("fresh", False)),
+    )
+
+async def post_job(user_id: int, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Задание generate-post: то же, что POST /generate-post, но в воркере очереди"""
+    return await run_job(user_id, lambda: build_post(user_id, params["prompt"], params.get("fresh", False)))
+
+job_queue.register("generate-ideas", ideas_job)
+job_queue.register("generate-post", post_job)
+
+async def load_job(user_id: int, job_id: int):
+    # Статус читаем из primary: на реплике свежее завершение задания может быть еще не видно
+    async with AsyncSessionLocal() as db:
+        return await jobs_repo.get_user_job(db, user_id, job_id)
+
+@router.post("/jobs", response_model=JobResponse, status_code=202)
+async def create_job(
+    request: JobCreateRequest,
+    current_user: UserModel = Depends(get_current_active_user)
+):
+    """Ставит генерацию в очередь; результат - GET /ai-requests/jobs/{id} или поток /jobs/{id}/events"""
+    if request.kind == "generate-post" and not request.prompt:
+        raise HTTPException(status_code=422, detail="prompt is required for generate-post")
+    if request.kind == "generate-ideas" and current_user.company is None:
+        raise HTTPException(status_code=400, detail="Сначала создайте компанию")
+    log_request(current_user.id, request)
+
+    params = {"fresh": request.fresh}
+    if request.kind == "generate-post":
+        params["prompt"] = request.prompt
+    else:
+        params["with_images"] = request.with_images
+    async with AsyncSessionLocal() as db:
+        if await jobs_repo.count_pending_jobs(db, current_user.id) >= settings.jobs_max_pending_per_user:
+            raise HTTPException(status_code=429, detail="Too many pending jobs. Please wait for them to finish")
+        job = await jobs_repo.create_job(db, current_user.id, request.kind, params)
+    job_queue.notify()
+    return job
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: int,
+    wait: float = Query(default=0, ge=0, description="Long-poll: ждать завершения до wait секунд"),
+    current_user: UserModel = Depends(get_current_active_user)
+):
+    """Статус и результат задания; с wait ответ приходит, как только задание завершится"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + min(wait, settings.jobs_wait_max_seconds)
+    while True:
+        job = await load_job(current_user.id, job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Задание не найдено")
+        remaining = deadline - loop.time()
+        if job.status in FINISHED_JOB_STATUSES or remaining <= 0:
+            return job
+        # Соединение с БД между проверками не держим
+        await job_queue.wait(job_id, min(remaining, settings.jobs_poll_seconds))
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(
+    job_id: int,
+    current_user: UserModel = Depends(get_current_active_user)
+):
+    """SSE: status - при каждой смене статуса, затем done с результатом или error"""
+    user_id = current_user.id
+    job = await load_job(user_id, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Задание не найдено")
+
+    async def events(job):
+        status = None
+        while True:
+            if job.status != status:
+                status = job.status
+                yield sse_event("status", {"id": job.id, "status": status, "attempts": job.attempts})
+            if status == "succeeded":
+                yield sse_event("done", job.result)
+                return
+            if status == "failed":
+                yield sse_event("error", job.error)
+                return
+            await job_queue.wait(job_id, settings.jobs_poll_seconds)
+            job = await load_job(user_id, job_id)
+
+    return StreamingResponse(events(job), media_type="text/event-stream", headers=SSE_HEADERS)
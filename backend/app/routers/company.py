@@ -1,16 +1,21 @@
 from datetime import timedelta
 from typing import Annotated, List
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
+from ..database import get_async_db
+from ..repositories import companies as companies_repo
 from ..schemas import User
 from ..schemas import Company, CompanyCreate, CompanyUpdate
 from ..models.models import Company as CompanyModel, User as UserModel
 from ..utils.auth import (
-    get_current_active_user
+    get_current_active_user,
+    get_async_read_db,
+    mark_user_write
 )
+from ..utils.principal_cache import invalidate_user
+from ..utils.conditional import conditional_response, last_modified_of, make_etag
 from ..config import settings
 
 router = APIRouter(
@@ -22,75 +27,73 @@ router = APIRouter(
 async def get_companies(
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     user: UserModel = Depends(get_current_active_user)
     ):
     
-    companies = db.query(CompanyModel).filter(CompanyModel.user_id == user.id).offset(skip).limit(limit).all()
-    return companies
+    return await companies_repo.list_user_companies(db, user.id, skip, limit)
 
 
 @router.get("/{company_id}", response_model=Company)
 async def get_company(company_id: int, 
-                      db: Session = Depends(get_db),
+                      request: Request,
+                      response: Response,
+                      db: AsyncSession = Depends(get_async_read_db),
                       user: UserModel = Depends(get_current_active_user)
                       ):
-    company = db.query(CompanyModel).filter(CompanyModel.id == company_id).first()
+    company = await companies_repo.get_company(db, company_id)
     if company is None:
         raise HTTPException(status_code=404, detail="Company not found")
+
+    not_modified = conditional_response(
+        request,
+        response,
+        make_etag("company", company.id, company.created_at, company.updated_at),
+        last_modified_of([company.created_at, company.updated_at]),
+    )
+    if not_modified is not None:
+        return not_modified
     return company
 
 @router.put("/{company_id}", response_model=Company)
 async def update_company(company_id: int, 
                          company: CompanyUpdate, 
-                         db: Session = Depends(get_db),
+                         db: AsyncSession = Depends(get_async_db),
                          user: UserModel = Depends(get_current_active_user)
                          ):
-    db_company = db.query(CompanyModel).filter(CompanyModel.id == company_id).first()
+    db_company = await companies_repo.get_company(db, company_id)
     if db_company is None:
         raise HTTPException(status_code=404, detail="Company not found")
 
-    for key, value in company.dict(exclude_unset=True).items():
-        setattr(db_company, key, value)
-
-    db.commit()
-    db.refresh(db_company)
+    db_company = await companies_repo.update_company(db, db_company, company.dict(exclude_unset=True))
+    # Компания владельца закеширована вместе с пользователем
+    invalidate_user(db_company.user_id)
+    mark_user_write(user.id)
     return db_company
 
 @router.delete("/{company_id}")
 async def delete_company(company_id: int, 
-                         db: Session = Depends(get_db),
+                         db: AsyncSession = Depends(get_async_db),
                          user: UserModel = Depends(get_current_active_user)):
-    db_company = db.query(CompanyModel).filter(CompanyModel.id == company_id).first()
+    db_company = await companies_repo.get_company(db, company_id)
     if db_company is None:
         raise HTTPException(status_code=404, detail="Company not found")
 
-    db.delete(db_company)
-    db.commit()
+    owner_id = db_company.user_id
+    await companies_repo.delete_company(db, db_company)
+    invalidate_user(owner_id)
+    mark_user_write(user.id)
     return {"message": "Company deleted successfully"}
 
 @router.post("/create", response_model=Company)
 async def create_company(company: CompanyCreate,
-                         db: Session = Depends(get_db),
+                         db: AsyncSession = Depends(get_async_db),
                          user: UserModel = Depends(get_current_active_user)):
     
 
-    db_company = CompanyModel(
-            name = company.name,
-            industry = company.industry,
-            region = company.region,
-            short_about = company.short_about,
-            long_about = company.long_about,
-            brand_colors = company.brand_colors,
-            brand_font = company.brand_font,
-            logo_url = company.logo_url,
-            brand_book_url = company.brand_book_url,
-            user_id = user.id
-    )
-
-    db.add(db_company)
-    db.commit()
-    db.refresh(db_company)
+    db_company = await companies_repo.create_company(db, user.id, company.dict())
+    invalidate_user(user.id)
+    mark_user_write(user.id)
 
     return db_company
 
@@ -1,12 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel, Field
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from datetime import datetime
+import asyncio
+from contextlib import asynccontextmanager
 
-from ..utils.auth import get_current_active_user
-from ..models.models import User as UserModel, Post as PostModel
-from ..database import get_db
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import Any, Dict, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timezone
+
+from ..utils.auth import get_current_active_user, get_async_read_db, mark_user_write
+from ..models.models import User as UserModel
+from ..config import settings
+from ..database import get_async_db, get_read_session
+from ..repositories import posts as posts_repo
+from ..repositories import similarity as similarity_repo
+from ..utils import minhash
+from ..utils.blob_store import decode_base64_image
+from ..utils.images import store_image
+from ..utils.pagination import encode_cursor, decode_cursor, encode_search_cursor, decode_search_cursor
+from ..utils.scheduler import publish_scheduler
+from ..utils import export
+from ..utils.conditional import conditional_response, last_modified_of, make_etag
 
 router = APIRouter(
     prefix="/posts",
@@ -31,85 +45,345 @@ class PostResponse(BaseModel):
     description: str
     benefits: List[str]
     hashtags: List[str]
-    image_base64: Optional[str]
+    image_hash: Optional[str] = None
+    image_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
     created_at: datetime
     is_published: bool
+    published_at: Optional[datetime] = None
+    scheduled_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
+class PostSchedule(BaseModel):
+    scheduled_at: datetime
+
+class BatchItemError(BaseModel):
+    index: int
+    errors: List[Dict[str, Any]]
+
+class PostBatchResponse(BaseModel):
+    # ids[i] - id созданного поста для i-го элемента запроса или None, если элемент не прошел проверку
+    ids: List[Optional[int]]
+    errors: List[BatchItemError]
+
+class PostListItem(BaseModel):
+    id: int
+    title: str
+    image_hash: Optional[str] = None
+    image_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    created_at: datetime
+    is_published: bool
+    published_at: Optional[datetime] = None
+    scheduled_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class PostListResponse(BaseModel):
+    items: List[PostListItem]
+    next_cursor: Optional[str] = None
+
+class PostSearchItem(PostListItem):
+    rank: float
+
+class SimilarPost(PostListItem):
+    similarity: float
+
+class PostSearchResponse(BaseModel):
+    items: List[PostSearchItem]
+    next_cursor: Optional[str] = None
+
 @router.post("/", response_model=PostResponse)
 async def create_post(
     post: PostCreate,
     current_user: UserModel = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Создание нового поста"""
+    values = post.dict(exclude={"image_base64"})
+    # Изображение и миниатюры хранятся в blob store, в таблице только их хеши
+    if post.image_base64:
+        try:
+            values["image_hash"], values["thumbnails"] = await store_image(decode_base64_image(post.image_base64))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     try:
-        db_post = PostModel(
-            user_id=current_user.id,
-            company_name=post.company_name,
-            business_type=post.business_type,
-            region=post.region,
-            language=post.language,
-            title=post.title,
-            description=post.description,
-            benefits=post.benefits,
-            hashtags=post.hashtags,
-            image_prompt=post.image_prompt,
-            image_base64=post.image_base64
-        )
-        db.add(db_post)
-        db.commit()
-        db.refresh(db_post)
+        db_post = await posts_repo.create_post(db, current_user.id, values)
+        mark_user_write(current_user.id)
         return db_post
     except Exception as e:
-        db.rollback()
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/batch", response_model=PostBatchResponse)
+async def create_posts_batch(
+    items: List[Dict[str, Any]] = Body(...),
+    current_user: UserModel = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Массовое создание постов: проверка всех элементов, затем один INSERT в одной транзакции"""
+    if len(items) > settings.posts_batch_max_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Слишком много постов в запросе (максимум {settings.posts_batch_max_size})",
+        )
+
+    # Некорректные элементы не отменяют весь пакет, а возвращаются с ошибками по индексу
+    valid = []
+    errors = []
+    for index, item in enumerate(items):
+        try:
+            post = PostCreate.model_validate(item)
+            image = decode_base64_image(post.image_base64) if post.image_base64 else None
+        except ValidationError as e:
+            # Без input: в ответе не должны повторяться присланные данные, например мегабайты base64
+            errors.append({"index": index, "errors": e.errors(include_url=False, include_context=False, include_input=False)})
+            continue
+        except ValueError as e:
+            errors.append({"index": index, "errors": [{"loc": ["image_base64"], "msg": str(e), "type": "value_error"}]})
+            continue
+        valid.append((index, post, image))
+
+    # Изображения обрабатываются параллельно в пуле процессов; одинаковые картинки хранятся один раз
+    stored = await asyncio.gather(
+        *(store_image(image) for _, _, image in valid if image is not None),
+        return_exceptions=True,
+    )
+    stored = iter(stored)
+    rows = []
+    created_items = []
+    for index, post, image in valid:
+        values = post.dict(exclude={"image_base64"})
+        if image is not None:
+            result = next(stored)
+            if isinstance(result, ValueError):
+                errors.append({"index": index, "errors": [{"loc": ["image_base64"], "msg": str(result), "type": "value_error"}]})
+                continue
+            if isinstance(result, BaseException):
+                raise result
+            values["image_hash"], values["thumbnails"] = result
+        rows.append(values)
+        created_items.append(index)
+    errors.sort(key=lambda error: error["index"])
+
+    try:
+        created_ids = await posts_repo.create_posts_bulk(db, current_user.id, rows)
+    except Exception as e:
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
+    if created_ids:
+        mark_user_write(current_user.id)
 
-@router.get("/", response_model=List[PostResponse])
+    ids: List[Optional[int]] = [None] * len(items)
+    for index, post_id in zip(created_items, created_ids):
+        ids[index] = post_id
+    return {"ids": ids, "errors": errors}
+
+@router.get("/", response_model=PostListResponse)
 async def get_user_posts(
+    request: Request,
+    response: Response,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    published: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    current_user: UserModel = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Постраничный список постов пользователя (полный пост - GET /posts/{post_id})"""
+    # Берем на один пост больше, чтобы понять, есть ли следующая страница
+    posts = await posts_repo.list_user_posts_page(
+        db,
+        current_user.id,
+        limit + 1,
+        after=decode_cursor(cursor),
+        is_published=published,
+        created_from=created_from,
+        created_to=created_to,
+    )
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        next_cursor = encode_cursor(posts[-1].created_at, posts[-1].id)
+
+    # Страница не изменилась, если не изменился ни один пост в ней и граница следующей страницы
+    etag = make_etag("posts", [(post.id, post.created_at, post.updated_at) for post in posts], next_cursor)
+    last_modified = last_modified_of(post.updated_at or post.created_at for post in posts)
+    not_modified = conditional_response(request, response, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+    return {"items": posts, "next_cursor": next_cursor}
+
+@router.get("/search", response_model=PostSearchResponse)
+async def search_posts(
+    q: Optional[str] = Query(default=None, max_length=200),
+    tag: List[str] = Query(default=[]),
+    language: Optional[str] = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
     current_user: UserModel = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    """Получение всех постов пользователя"""
-    posts = db.query(PostModel).filter(PostModel.user_id == current_user.id).all()
-    return posts
+    """Полнотекстовый поиск по заголовку, описанию и хештегам; tag - фильтр по хештегам (все сразу)"""
+    q = q.strip() if q else None
+    if not q and not tag:
+        raise HTTPException(status_code=400, detail="Укажите запрос q или хотя бы один tag")
+    # Хештеги хранятся с решеткой
+    hashtags = [value if value.startswith("#") else f"#{value}" for value in tag]
+
+    found = await posts_repo.search_user_posts(
+        db,
+        current_user.id,
+        limit + 1,
+        text=q,
+        hashtags=hashtags,
+        language=language,
+        after=decode_search_cursor(cursor),
+    )
+    next_cursor = None
+    if len(found) > limit:
+        found = found[:limit]
+        last_post, last_rank = found[-1]
+        next_cursor = encode_search_cursor(last_rank, last_post.id)
+    items = [
+        {**PostListItem.model_validate(post).model_dump(), "rank": rank}
+        for post, rank in found
+    ]
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.get("/export")
+async def export_posts(
+    format: str = Query(default="ndjson", pattern="^(ndjson|csv)$"),
+    include_images: bool = False,
+    current_user: UserModel = Depends(get_current_active_user)
+):
+    """Потоковая выгрузка всех постов пользователя в NDJSON или CSV"""
+    user_id = current_user.id
+
+    async def generate():
+        # Сессия открывается внутри генератора и живет, пока отдается ответ
+        async with asynccontextmanager(get_read_session)(user_id) as db:
+            if format == "csv":
+                yield export.csv_header(include_images)
+            async for chunk in posts_repo.stream_user_posts(db, user_id, settings.export_chunk_size):
+                if format == "csv":
+                    yield export.csv_chunk(chunk, include_images)
+                else:
+                    yield export.ndjson_chunk(chunk, include_images)
+
+    return StreamingResponse(
+        generate(),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="posts.{format}"'},
+    )
 
 @router.get("/{post_id}", response_model=PostResponse)
 async def get_post(
     post_id: int,
+    request: Request,
+    response: Response,
     current_user: UserModel = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Получение конкретного поста"""
-    post = db.query(PostModel).filter(
-        PostModel.id == post_id,
-        PostModel.user_id == current_user.id
-    ).first()
-    
+    post = await posts_repo.get_user_post(db, current_user.id, post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Пост не найден")
-    
+
+    etag = make_etag("post", post.id, post.created_at, post.updated_at)
+    not_modified = conditional_response(request, response, etag, last_modified_of([post.created_at, post.updated_at]))
+    if not_modified is not None:
+        return not_modified
     return post
 
 @router.put("/{post_id}/publish")
 async def publish_post(
     post_id: int,
     current_user: UserModel = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Публикация поста"""
-    post = db.query(PostModel).filter(
-        PostModel.id == post_id,
-        PostModel.user_id == current_user.id
-    ).first()
-    
+    post = await posts_repo.get_user_post(db, current_user.id, post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Пост не найден")
     
-    post.is_published = True
-    post.published_at = datetime.now()
-    db.commit()
+    await posts_repo.publish_post(db, post)
+    mark_user_write(current_user.id)
     
     return {"message": "Пост успешно опубликован"}
+
+@router.put("/{post_id}/schedule", response_model=PostResponse)
+async def schedule_post(
+    post_id: int,
+    schedule: PostSchedule,
+    current_user: UserModel = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Отложенная публикация поста в указанное время"""
+    post = await posts_repo.get_user_post(db, current_user.id, post_id)
+    if not post:
+        raise HTTPException(status_code=404, detail="Пост не найден")
+    if post.is_published:
+        raise HTTPException(status_code=400, detail="Пост уже опубликован")
+
+    scheduled_at = schedule.scheduled_at
+    if scheduled_at.tzinfo is None:
+        # Время без часового пояса считаем UTC
+        scheduled_at = scheduled_at.replace(tzinfo=timezone.utc)
+    await posts_repo.schedule_post(db, post, scheduled_at)
+    mark_user_write(current_user.id)
+    publish_scheduler.notify(post.id, scheduled_at)
+    return post
+
+@router.delete("/{post_id}/schedule", response_model=PostResponse)
+async def unschedule_post(
+    post_id: int,
+    current_user: UserModel = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Отмена отложенной публикации"""
+    post = await posts_repo.get_user_post(db, current_user.id, post_id)
+    if not post:
+        raise HTTPException(status_code=404, detail="Пост не найден")
+    if post.is_published:
+        raise HTTPException(status_code=400, detail="Пост уже опубликован")
+
+    await posts_repo.schedule_post(db, post, None)
+    mark_user_write(current_user.id)
+    return post
+
+@router.get("/{post_id}/similar", response_model=List[SimilarPost])
+async def get_similar_posts(
+    post_id: int,
+    limit: int = Query(default=10, ge=1, le=50),
+    min_similarity: Optional[float] = Query(default=None, ge=0, le=1),
+    current_user: UserModel = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Посты той же компании с почти таким же заголовком и описанием"""
+    post = await posts_repo.get_user_post(db, current_user.id, post_id)
+    if not post:
+        raise HTTPException(status_code=404, detail="Пост не найден")
+    if post.minhash is None:
+        return []
+
+    found = await similarity_repo.find_similar(
+        db,
+        current_user.id,
+        post.company_name,
+        minhash.unpack(post.minhash),
+        settings.similar_posts_min_similarity if min_similarity is None else min_similarity,
+        limit,
+        exclude_id=post.id,
+    )
+    scores = dict(found)
+    posts = await posts_repo.get_posts_by_ids(db, current_user.id, [found_id for found_id, _ in found])
+    return [
+        {**PostListItem.model_validate(similar).model_dump(), "similarity": scores[similar.id]}
+        for similar in posts
+    ]
@@ -1,9 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
-from openai import OpenAI, OpenAIError
-import openai
 import logging
 import json
 from datetime import datetime
@@ -11,33 +10,17 @@ from datetime import datetime
 from ..utils.auth import get_current_active_user
 from ..models.models import User as UserModel
 from ..config import settings
+from ..utils.llm import chat_completion, chat_completion_stream, llm_http_exception, openai_error
+from ..utils.sse import SSE_HEADERS, sse_event
 
-# Настройка логгера
+# Файловый обработчик подключается при старте приложения (app.log_config)
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-
-# Создаем форматтер для логов
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-
-# Создаем обработчик для записи в файл
-file_handler = logging.FileHandler('chatgpt_api.log')
-file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
 
 router = APIRouter(
     prefix="/ai-requests",
     tags=["ai-requests"],
 )
 
-# Проверка наличия API ключа
-if not settings.openai_api_key:
-    logger.error("OpenAI API key is not set! Please check .env.gpt file")
-    raise ValueError("OpenAI API key is not set! Please check .env.gpt file")
-
-# Инициализация клиента OpenAI
-client = OpenAI(api_key=settings.openai_api_key)
-logger.info(f"OpenAI API key loaded: {settings.openai_api_key[:8]}...")
-
 class Message(BaseModel):
     role: str = Field(..., description="Роль отправителя (user/assistant/system)")
     content: str = Field(..., description="Содержание сообщения")
@@ -91,9 +74,33 @@ def log_error(user_id: int, error: Exception):
     }
     logger.error(f"ChatGPT Error: {json.dumps(log_data, ensure_ascii=False)}")
 
+async def stream_chat(user_id: int, chat_request: ChatRequest):
+    """SSE: token - очередной фрагмент ответа, done - ответ целиком, error - ошибка после начала потока"""
+    parts = []
+    try:
+        async for delta in chat_completion_stream(
+            model=chat_request.model,
+            messages=[msg.dict() for msg in chat_request.messages],
+            temperature=chat_request.temperature,
+            max_tokens=chat_request.max_tokens
+        ):
+            parts.append(delta)
+            yield sse_event("token", {"content": delta})
+        response_data = {"response": "".join(parts)}
+        log_response(user_id, response_data)
+        yield sse_event("done", response_data)
+    except openai_error() as e:
+        log_error(user_id, e)
+        error = llm_http_exception(e)
+        yield sse_event("error", {"status_code": error.status_code, "detail": error.detail})
+    except Exception as e:
+        log_error(user_id, e)
+        yield sse_event("error", {"status_code": 500, "detail": "Внутренняя ошибка сервера"})
+
 @router.post("/chat")
 async def chat_with_gpt(
     chat_request: ChatRequest,
+    stream: bool = Query(default=False, description="Отдавать ответ по токенам (Server-Sent Events)"),
     current_user: UserModel = Depends(get_current_active_user)
 ):
     try:
@@ -113,8 +120,15 @@ async def chat_with_gpt(
                     detail=f"Invalid role: {msg.role}. Must be one of: {', '.join(valid_roles)}"
                 )
         
+        if stream:
+            return StreamingResponse(
+                stream_chat(current_user.id, chat_request),
+                media_type="text/event-stream",
+                headers=SSE_HEADERS,
+            )
+
         # Создаем запрос к ChatGPT
-        response = client.chat.completions.create(
+        response = await chat_completion(
             model=chat_request.model,
             messages=[msg.dict() for msg in chat_request.messages],
             temperature=chat_request.temperature,
@@ -128,28 +142,12 @@ async def chat_with_gpt(
         
         return response_data
         
-    except OpenAIError as e:
+    except HTTPException:
+        raise
+    except openai_error() as e:
         # Логируем ошибку API
         log_error(current_user.id, e)
-        error_message = str(e)
-        
-        # Обработка различных типов ошибок
-        if "API key" in error_message:
-            raise HTTPException(
-                status_code=500,
-                detail="Invalid OpenAI API key. Please check your .env.gpt file"
-            )
-        elif "insufficient_quota" in error_message:
-            raise HTTPException(
-                status_code=429,
-                detail="OpenAI API quota exceeded. Please check your billing details at https://platform.openai.com/account/billing"
-            )
-        elif "rate_limit" in error_message:
-            raise HTTPException(
-                status_code=429,
-                detail="Rate limit exceeded. Please try again later"
-            )
-        raise HTTPException(status_code=500, detail=str(e))
+        raise llm_http_exception(e)
     except Exception as e:
         # Логируем неожиданные ошибки
         log_error(current_user.id, e)
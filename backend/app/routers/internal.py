@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends
+
+from ..database import pool_stats, replica_router
+from ..utils.principal_cache import principal_cache
+from ..utils.hashing import hashing_stats
+from ..utils.revocation import revocation_list
+from ..utils.rate_limit import login_throttle
+from ..utils.scheduler import publish_scheduler
+from ..utils.images import image_stats
+from ..utils.llm import llm_stats
+from ..utils.generation_cache import generation_cache
+from ..utils.jobs import job_queue
+from ..utils.auth import get_current_admin_user
+
+# Счетчики раскрывают нагрузку и конфигурацию процесса: только для администраторов
+router = APIRouter(
+    prefix="/internal",
+    tags=["internal"],
+    include_in_schema=False,
+    dependencies=[Depends(get_current_admin_user)],
+)
+
+@router.get("/metrics")
+async def get_metrics():
+    """Внутренние счетчики процесса для мониторинга"""
+    return {
+        "db_pools": pool_stats(),
+        "db_replicas": replica_router.snapshot(),
+        "principal_cache": principal_cache.stats(),
+        "password_hashing": hashing_stats(),
+        "token_revocation": revocation_list.snapshot(),
+        "login_throttle": login_throttle.stats,
+        "publish_scheduler": publish_scheduler.snapshot(),
+        "image_processing": image_stats(),
+        "openai": llm_stats(),
+        "generation_cache": generation_cache.snapshot(),
+        "generation_jobs": job_queue.snapshot(),
+    }
@@ -0,0 +1,76 @@
+import re
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+
+from ..utils.blob_store import HASH_RE, detect_content_type, get_blob_store
+
+router = APIRouter(
+    prefix="/media",
+    tags=["media"],
+)
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Один диапазон из заголовка Range; несколько диапазонов отдаем целиком"""
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # bytes=-N: последние N байт
+        length = int(end)
+        if length == 0:
+            raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+@router.get("/{blob_hash}")
+async def get_media(blob_hash: str, request: Request):
+    """Отдача изображения по хешу содержимого с поддержкой Range и ETag"""
+    if not HASH_RE.match(blob_hash):
+        raise HTTPException(status_code=404, detail="Not found")
+    store = get_blob_store()
+    size = await store.size(blob_hash)
+    if size is None:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    # Содержимое по хешу не меняется, поэтому хеш - сильный ETag, а кешировать можно навсегда
+    etag = f'"{blob_hash}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    content_type = detect_content_type(await store.read_head(blob_hash))
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range.strip() == etag:
+        byte_range = parse_range(request.headers.get("range"), size)
+
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(store.stream(blob_hash, 0, size - 1), media_type=content_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        store.stream(blob_hash, start, end), status_code=206, media_type=content_type, headers=headers
+    )
@@ -1,3 +1,3 @@
 from .user import User, UserBase, UserCreate
-from .token import Token, TokenData
+from .token import Token, TokenData, TokenRevokeRequest, TokenRevokeResponse
 from .company import Company, CompanyBase, CompanyCreate, CompanyUpdate
\ No newline at end of file
@@ -1,9 +1,15 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 class Token(BaseModel):
     access_token: str
     token_type: str
 
 class TokenData(BaseModel):
-    email: Optional[str] = None 
\ No newline at end of file
+    email: Optional[str] = None
+
+class TokenRevokeRequest(BaseModel):
+    jtis: List[str]
+
+class TokenRevokeResponse(BaseModel):
+    revoked: int
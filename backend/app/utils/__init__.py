@@ -1,8 +1,14 @@
 from .auth import (
     verify_password,
     get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
     authenticate_user,
     create_access_token,
     get_current_user,
-    get_current_active_user
+    get_current_active_user,
+    get_current_admin_user,
+    get_async_read_db,
+    mark_user_write,
+    decode_access_token
 ) 
\ No newline at end of file
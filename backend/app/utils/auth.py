@@ -1,15 +1,21 @@
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
+from ..database import get_async_db, get_read_session, replica_router
+from ..repositories import users as users_repo
 from ..models.models import User
 from ..schemas.token import TokenData
 from ..config import settings
+from .principal_cache import principal_cache, token_digest, invalidate_user
+from .hashing import run_hashing
+from .revocation import revocation_list
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
@@ -20,13 +26,17 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = db.query(User).options(
-        joinedload(User.company)
-    ).filter(User.email == email).first()
+async def verify_password_async(plain_password, hashed_password):
+    return await run_hashing(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await run_hashing(get_password_hash, password)
+
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await users_repo.get_user_by_email(db, email)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return False
     return user
 
@@ -36,11 +46,12 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
-    to_encode.update({"exp": expire})
+    # jti позволяет отозвать конкретный токен до истечения exp
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
-async def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+def decode_access_token(token: str) -> dict:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -48,22 +59,64 @@ async def get_current_user(db: Session = Depends(get_db), token: str = Depends(o
     )
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
     except JWTError:
         raise credentials_exception
-    
-    user = db.query(User).options(
-        joinedload(User.company)
-    ).filter(User.email == token_data.email).first()
-    
+    if payload.get("sub") is None:
+        raise credentials_exception
+    return payload
+
+async def get_current_user(db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)):
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    payload = decode_access_token(token)
+    token_data = TokenData(email=payload["sub"])
+    cache_key = token_digest(token)
+
+    # Для неотозванных токенов это одна проверка по фильтру Блума в памяти
+    jti = payload.get("jti")
+    if jti is not None and await revocation_list.is_revoked(db, jti):
+        principal_cache.invalidate_token(cache_key)
+        raise credentials_exception
+
+    # Горячий путь: проверка подписи JWT + поиск в кеше, без запроса к БД
+    user = principal_cache.get(cache_key)
+    if user is not None:
+        return user
+
+    user = await users_repo.get_user_by_email(db, token_data.email)
     if user is None:
         raise credentials_exception
+
+    # Отвязываем объекты от сессии, чтобы коммиты в обработчиках не экспайрили закешированные поля.
+    # Закешированный пользователь общий для запросов и используется только на чтение
+    if user.company is not None:
+        db.expunge(user.company)
+    db.expunge(user)
+    principal_cache.set(cache_key, user, token_exp=payload.get("exp"))
     return user
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user 
\ No newline at end of file
+    return current_user
+
+async def get_async_read_db(current_user: User = Depends(get_current_active_user)):
+    """Сессия для read-only эндпоинтов: реплика, кроме окна read-your-writes после записи пользователя"""
+    async for session in get_read_session(current_user.id):
+        yield session
+
+def mark_user_write(user_id: int):
+    replica_router.mark_write(user_id)
+
+async def get_current_admin_user(current_user: User = Depends(get_current_active_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+    return current_user
+
+@event.listens_for(User, "after_update")
+def _invalidate_principal_on_update(mapper, connection, target):
+    # Деактивация, смена email и любые другие изменения пользователя сбрасывают кеш
+    invalidate_user(target.id)
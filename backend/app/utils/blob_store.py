@@ -0,0 +1,151 @@
+import abc
+import asyncio
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from ..config import BASE_DIR, settings
+
+HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# Сигнатуры форматов, которые мы храним
+_MAGIC_TYPES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def detect_content_type(head: bytes) -> str:
+    for magic, content_type in _MAGIC_TYPES:
+        if head.startswith(magic):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def decode_base64_image(value: str) -> bytes:
+    """base64 из клиента, в том числе в виде data URI"""
+    if value.startswith("data:") and "," in value:
+        value = value.split(",", 1)[1]
+    try:
+        return base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid base64 image")
+
+
+class BlobStore(abc.ABC):
+    """Хранилище бинарных объектов, адресуемых по sha256 содержимого.
+
+    Интерфейс повторяет возможности S3-совместимых хранилищ (put/head/ranged get),
+    чтобы можно было подключить объектное хранилище без изменения вызывающего кода.
+    Неполная реализация не создается: ошибка видна при старте, а не на первом запросе.
+    """
+
+    @abc.abstractmethod
+    async def put(self, data: bytes) -> str:
+        """Сохраняет данные и возвращает их хеш; одинаковое содержимое хранится один раз"""
+
+    @abc.abstractmethod
+    async def size(self, blob_hash: str) -> Optional[int]:
+        """Размер объекта или None, если его нет"""
+
+    @abc.abstractmethod
+    async def read_head(self, blob_hash: str, length: int = 16) -> bytes:
+        """Первые length байт объекта (определение формата)"""
+
+    @abc.abstractmethod
+    def stream(self, blob_hash: str, start: int, end: int, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+        """Отдает байты [start, end] включительно порциями по chunk_size"""
+
+    async def read(self, blob_hash: str) -> Optional[bytes]:
+        """Объект целиком или None, если его нет"""
+        size = await self.size(blob_hash)
+        if size is None:
+            return None
+        return b"".join([chunk async for chunk in self.stream(blob_hash, 0, size - 1)])
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def _path(self, blob_hash: str) -> Path:
+        if not HASH_RE.match(blob_hash):
+            raise ValueError("Invalid blob hash")
+        # Двухуровневое шардирование, чтобы в одном каталоге не было миллионов файлов
+        return self.root / blob_hash[:2] / blob_hash[2:4] / blob_hash
+
+    async def put(self, data: bytes) -> str:
+        blob_hash = content_hash(data)
+        await asyncio.to_thread(self._write, self._path(blob_hash), data)
+        return blob_hash
+
+    @staticmethod
+    def _write(path: Path, data: bytes):
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Пишем во временный файл и атомарно переименовываем, чтобы читатели не увидели частичный файл
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    async def size(self, blob_hash: str) -> Optional[int]:
+        try:
+            return (await asyncio.to_thread(self._path(blob_hash).stat)).st_size
+        except FileNotFoundError:
+            return None
+
+    async def read_head(self, blob_hash: str, length: int = 16) -> bytes:
+        def read():
+            with open(self._path(blob_hash), "rb") as blob_file:
+                return blob_file.read(length)
+        return await asyncio.to_thread(read)
+
+    async def stream(self, blob_hash: str, start: int, end: int, chunk_size: int = 64 * 1024):
+        blob_file = await asyncio.to_thread(open, self._path(blob_hash), "rb")
+        try:
+            await asyncio.to_thread(blob_file.seek, start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await asyncio.to_thread(blob_file.read, min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            await asyncio.to_thread(blob_file.close)
+
+
+@lru_cache(maxsize=None)
+def get_blob_store() -> BlobStore:
+    if settings.blob_store_backend != "local":
+        raise ValueError(f"Unknown blob store backend: {settings.blob_store_backend}")
+    root = Path(settings.blob_store_path)
+    if not root.is_absolute():
+        root = BASE_DIR / root
+    return LocalBlobStore(root)
+
+
+def media_url(blob_hash: Optional[str]) -> Optional[str]:
+    if not blob_hash:
+        return None
+    return f"{settings.media_url_prefix.rstrip('/')}/{blob_hash}"
@@ -0,0 +1,72 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+
+from fastapi import Request, Response
+
+# Ответы зависят от пользователя: кешировать можно только в браузере и только с перепроверкой
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Слабый ETag из идентификаторов и версий (updated_at) ресурса.
+
+    Слабый, потому что сжатый и несжатый ответ - одна версия ресурса: 200 после CompressionMiddleware
+    и 304 (его не сжимают) отдают один и тот же валидатор.
+    """
+    digest = hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=16).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _opaque_tag(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def last_modified_of(values: Iterable[Optional[datetime]]) -> Optional[datetime]:
+    values = [_as_utc(value) for value in values if value is not None]
+    return max(values) if values else None
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Колонки без часового пояса хранят время сервера БД, считаем его UTC
+    value = value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+    # В HTTP-дате нет долей секунды
+    return value.replace(microsecond=0)
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime]) -> dict:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Authorization"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """If-None-Match имеет приоритет; If-Modified-Since учитывается только без него"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        # Для GET сравнение слабое: W/"x" совпадает с "x"
+        return "*" in tags or _opaque_tag(etag) in [_opaque_tag(tag) for tag in tags]
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified <= since
+    return False
+
+
+def conditional_response(
+    request: Request, response: Response, etag: str, last_modified: Optional[datetime] = None
+) -> Optional[Response]:
+    """Ставит валидаторы на ответ; если у клиента актуальная версия - возвращает 304 без тела"""
+    headers = validator_headers(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, Dict, List
+
+from .blob_store import media_url
+
+EXPORT_FIELDS = [
+    "id", "company_name", "business_type", "region", "language",
+    "title", "description", "benefits", "hashtags", "image_prompt",
+    "created_at", "updated_at", "is_published", "published_at", "scheduled_at",
+]
+IMAGE_FIELDS = ["image_hash", "image_url", "thumbnail_url"]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def export_fields(include_images: bool) -> List[str]:
+    return EXPORT_FIELDS + IMAGE_FIELDS if include_images else EXPORT_FIELDS
+
+
+def post_record(post, include_images: bool) -> Dict[str, Any]:
+    record = {field: getattr(post, field) for field in EXPORT_FIELDS}
+    if include_images:
+        # Изображение - ссылка на blob store, а не base64 внутри выгрузки
+        record["image_hash"] = post.image_hash
+        record["image_url"] = media_url(post.image_hash)
+        record["thumbnail_url"] = post.thumbnail_url
+    return record
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def ndjson_chunk(posts, include_images: bool) -> str:
+    return "".join(
+        json.dumps(post_record(post, include_images), ensure_ascii=False, default=_json_default) + "\n"
+        for post in posts
+    )
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def csv_header(include_images: bool) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(export_fields(include_images))
+    return buffer.getvalue()
+
+
+def csv_chunk(posts, include_images: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for post in posts:
+        record = post_record(post, include_images)
+        writer.writerow([_csv_value(record[field]) for field in export_fields(include_images)])
+    return buffer.getvalue()
@@ -0,0 +1,141 @@
+import copy
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import exc
+
+from ..config import settings
+from ..database import AsyncSessionLocal
+from ..repositories import generation_cache as cache_repo
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(kind: str, version: int, model: str, temperature: float, **inputs) -> str:
+    """Ключ записи: меняется при смене шаблона промпта (version), модели, температуры или входных данных"""
+    raw = json.dumps(
+        {"kind": kind, "version": version, "model": model, "temperature": temperature, "inputs": inputs},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """Кеш результатов генерации: LRU в памяти процесса перед таблицей generation_cache с TTL.
+
+    Ошибки БД не ломают генерацию: кеш тогда просто промахивается.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: int, cleanup_interval: float = 3600.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.cleanup_interval = cleanup_interval
+        self._entries: "OrderedDict[str, Tuple[float, Any, float]]" = OrderedDict()
+        self._cleaned_at = time.monotonic()
+        self.stats = {
+            "memory_hits": 0,
+            "db_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "writes": 0,
+            "db_errors": 0,
+            "saved_usd": 0.0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    async def get(self, key: str, fresh: bool = False, memory: bool = True) -> Optional[Any]:
+        """fresh=True - пропустить кеш (запись новой генерации все равно сохранится)"""
+        if not self.enabled:
+            return None
+        if fresh:
+            self.stats["bypassed"] += 1
+            return None
+        entry = self._memory_get(key)
+        if entry is not None:
+            self.stats["memory_hits"] += 1
+            return self._hit(entry[1], entry[2])
+        try:
+            async with AsyncSessionLocal() as db:
+                row = await cache_repo.get_entry(db, key)
+        except (exc.SQLAlchemyError, OSError) as e:
+            self.stats["db_errors"] += 1
+            logger.error(f"Generation cache read failed: {e}")
+            row = None
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        payload, cost_usd, expires_at = row
+        self.stats["db_hits"] += 1
+        if memory:
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            self._memory_set(key, payload, cost_usd, (expires_at - datetime.now(timezone.utc)).total_seconds())
+        return self._hit(payload, cost_usd)
+
+    async def set(self, key: str, kind: str, payload: Any, cost_usd: float = 0.0, memory: bool = True):
+        """memory=False - только в БД (изображения: держать их в памяти каждого воркера слишком дорого)"""
+        if not self.enabled:
+            return
+        if memory:
+            self._memory_set(key, copy.deepcopy(payload), cost_usd, self.ttl_seconds)
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+        try:
+            async with AsyncSessionLocal() as db:
+                await cache_repo.put_entry(db, key, kind, payload, cost_usd, expires_at)
+                # Истекшие записи чистим изредка, попутно с записью
+                if time.monotonic() - self._cleaned_at >= self.cleanup_interval:
+                    self._cleaned_at = time.monotonic()
+                    await cache_repo.delete_expired(db)
+        except (exc.SQLAlchemyError, OSError) as e:
+            self.stats["db_errors"] += 1
+            logger.error(f"Generation cache write failed: {e}")
+            return
+        self.stats["writes"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        hits = self.stats["memory_hits"] + self.stats["db_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def _hit(self, payload: Any, cost_usd: float) -> Any:
+        self.stats["saved_usd"] += cost_usd
+        # Вызывающий код дополняет результат (флаги дублей, изображения) - запись в памяти должна остаться нетронутой
+        return copy.deepcopy(payload)
+
+    def _memory_get(self, key: str) -> Optional[Tuple[float, Any, float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _memory_set(self, key: str, payload: Any, cost_usd: float, ttl: float):
+        if self.max_size <= 0 or ttl <= 0:
+            return
+        self._entries.pop(key, None)
+        self._entries[key] = (time.monotonic() + ttl, payload, cost_usd)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+generation_cache = GenerationCache(
+    max_size=settings.generation_cache_memory_size,
+    ttl_seconds=settings.generation_cache_ttl_seconds,
+)
@@ -0,0 +1,70 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+
+from ..config import settings
+from ..metrics import Histogram
+
+_executor: Optional[Executor] = None
+_pending = 0
+_rejected = 0
+_latency = Histogram((0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+
+
+def get_executor() -> Executor:
+    """Пул для bcrypt создается при первом использовании"""
+    global _executor
+    if _executor is None:
+        if settings.password_hash_executor == "process":
+            _executor = ProcessPoolExecutor(max_workers=settings.password_hash_workers)
+        else:
+            # bcrypt отпускает GIL, поэтому потоков достаточно для загрузки всех ядер
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.password_hash_workers,
+                thread_name_prefix="password-hash",
+            )
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def run_hashing(func: Callable, *args):
+    """Выполняет хеширование в пуле, отклоняя запросы при переполненной очереди"""
+    global _pending, _rejected
+    capacity = settings.password_hash_workers + settings.password_hash_queue_size
+    if _pending >= capacity:
+        _rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again later",
+            headers={"Retry-After": str(settings.password_hash_retry_after_seconds)},
+        )
+
+    _pending += 1
+    started = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), func, *args)
+    finally:
+        _pending -= 1
+        _latency.observe(time.perf_counter() - started)
+
+
+def hashing_stats() -> Dict[str, Any]:
+    workers = settings.password_hash_workers
+    return {
+        "workers": workers,
+        "in_flight": _pending,
+        "queue_depth": max(0, _pending - workers),
+        "queue_size": settings.password_hash_queue_size,
+        "rejected": _rejected,
+        "latency": _latency.snapshot(),
+    }
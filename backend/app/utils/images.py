@@ -0,0 +1,151 @@
+import asyncio
+import io
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from ..config import settings
+from ..metrics import Histogram
+from .blob_store import get_blob_store
+
+_executor: Optional[Executor] = None
+_encode_latency = Histogram((0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+_stats = {"processed": 0, "failed": 0, "bytes_in": 0, "bytes_out": 0}
+
+# Форматы Pillow, которые умеем отдавать
+OUTPUT_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+
+
+def get_executor() -> Executor:
+    """Пул процессов для кодирования изображений создается при первом использовании"""
+    global _executor
+    if _executor is None:
+        # spawn, а не fork: форк процесса с запущенным event loop, потоками и открытыми соединениями пулов БД
+        # копирует их состояние (в том числе захваченные блокировки) в воркер
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.image_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _encode(image, image_format: str, quality: int) -> bytes:
+    output = io.BytesIO()
+    if image_format == "JPEG":
+        if image.mode in ("RGBA", "LA", "P"):
+            # В JPEG нет прозрачности: накладываем на белый фон
+            from PIL import Image
+            rgba = image.convert("RGBA")
+            background = Image.new("RGB", rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        image.save(output, format="JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image.mode in ("LA", "P", "PA") else "RGB")
+        image.save(output, format=image_format, quality=quality, method=4)
+    return output.getvalue()
+
+
+def _resized(image, max_side: int):
+    if max(image.size) <= max_side:
+        return image
+    copy = image.copy()
+    copy.thumbnail((max_side, max_side))
+    return copy
+
+
+def process_image_sync(
+    data: bytes, image_format: str, quality: int, max_side: int, thumbnail_sizes: Tuple[int, ...]
+) -> Dict[str, Any]:
+    """Перекодирует изображение и строит миниатюры; выполняется в процессе пула"""
+    from PIL import Image, UnidentifiedImageError
+
+    started = time.perf_counter()
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            source_format = image.format
+            # Уже подходящее изображение не перекодируем: повторное сжатие с потерями только ухудшит его
+            if source_format == image_format and max(image.size) <= max_side:
+                main = data
+            else:
+                main = _encode(_resized(image, max_side), image_format, quality)
+                # Простые картинки (плоские иллюстрации) иногда лучше сжаты в исходном формате
+                if len(main) >= len(data) and max(image.size) <= max_side:
+                    main = data
+            thumbnails = {
+                size: _encode(_resized(image, size), image_format, quality)
+                for size in thumbnail_sizes
+                if size < max(image.size)
+            }
+            width, height = image.size
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValueError("Invalid image")
+    return {
+        "image": main,
+        "thumbnails": thumbnails,
+        "width": width,
+        "height": height,
+        "encode_seconds": time.perf_counter() - started,
+    }
+
+
+def _thumbnail_sizes() -> Tuple[int, ...]:
+    return tuple(sorted(int(size) for size in settings.image_thumbnail_sizes.split(",") if size.strip()))
+
+
+async def process_image(data: bytes, thumbnails: bool = True) -> Dict[str, Any]:
+    """Перекодирование в пуле процессов, чтобы CPU-работа не блокировала event loop"""
+    image_format = OUTPUT_FORMATS.get(settings.image_format)
+    if image_format is None:
+        raise ValueError(f"Unknown image format: {settings.image_format}")
+    loop = asyncio.get_running_loop()
+    try:
+        result = await loop.run_in_executor(
+            get_executor(),
+            process_image_sync,
+            data,
+            image_format,
+            settings.image_quality,
+            settings.image_max_side,
+            _thumbnail_sizes() if thumbnails else (),
+        )
+    except ValueError:
+        _stats["failed"] += 1
+        raise
+    _stats["processed"] += 1
+    _stats["bytes_in"] += len(data)
+    _stats["bytes_out"] += len(result["image"])
+    _encode_latency.observe(result["encode_seconds"])
+    return result
+
+
+async def store_image(data: bytes) -> Tuple[str, Dict[str, str]]:
+    """Обрабатывает изображение и сохраняет его с миниатюрами; возвращает хеш и {размер: хеш}"""
+    result = await process_image(data)
+    store = get_blob_store()
+    sizes = list(result["thumbnails"])
+    hashes = await asyncio.gather(
+        store.put(result["image"]),
+        *(store.put(result["thumbnails"][size]) for size in sizes),
+    )
+    return hashes[0], {str(size): blob_hash for size, blob_hash in zip(sizes, hashes[1:])}
+
+
+def image_stats() -> Dict[str, Any]:
+    bytes_in = _stats["bytes_in"]
+    return {
+        **_stats,
+        "size_ratio": _stats["bytes_out"] / bytes_in if bytes_in else 0.0,
+        "encode_latency": _encode_latency.snapshot(),
+    }
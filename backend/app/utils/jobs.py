@@ -0,0 +1,205 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import exc
+
+from ..config import settings
+from ..database import AsyncSessionLocal, replica_router
+from ..metrics import Histogram
+from ..repositories import jobs as jobs_repo
+
+logger = logging.getLogger(__name__)
+
+# Обработчик задания: (user_id, params) -> result (JSON); ошибку возвращает JobError или исключение
+JobHandler = Callable[[int, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+JOB_SECONDS_BUCKETS = (0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class JobError(Exception):
+    """Ошибка задания в виде HTTP-ответа: сохраняется в generation_jobs.error"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class JobQueue:
+    """Пул воркеров очереди generation_jobs.
+
+    Работает в процессе API (JOBS_WORKER_ENABLED) или отдельно: python -m app.commands.job_worker.
+    Задания захватываются из БД через SKIP LOCKED, поэтому воркеров и процессов может быть сколько угодно;
+    задание в процессе, который упал, после окончания аренды (таймаут задания + запас) выполнит другой воркер.
+    """
+
+    def __init__(self, concurrency: int, poll_interval: float, timeout: float, max_attempts: int):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.handlers: Dict[str, JobHandler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        # job_id -> [событие завершения, число ожидающих]; запись удаляется, когда ждать перестал последний
+        self._finished: Dict[int, list] = {}
+        self.queue_wait = Histogram(JOB_SECONDS_BUCKETS)
+        self.run_time = Histogram(JOB_SECONDS_BUCKETS)
+        self.stats: Dict[str, int] = {
+            "claimed": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "released": 0,
+            "lost": 0,
+            "running": 0,
+            "errors": 0,
+        }
+
+    @property
+    def lease_seconds(self) -> float:
+        # Задание прерывается по таймауту раньше, чем истечет аренда, так что живое задание не перехватят
+        return self.timeout + 60.0
+
+    def register(self, kind: str, handler: JobHandler):
+        self.handlers[kind] = handler
+
+    def start(self, concurrency: Optional[int] = None):
+        if self._tasks:
+            return
+        self._stopping = False
+        count = concurrency or self.concurrency
+        self._tasks = [asyncio.create_task(self._worker(), name=f"job-worker-{index}") for index in range(count)]
+
+    async def stop(self):
+        """Останавливает воркеры; выполняемые задания возвращаются в очередь"""
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Новое задание в этом процессе: будим воркер, не дожидаясь опроса"""
+        self._wakeup.set()
+
+    async def wait(self, job_id: int, timeout: float):
+        """Ждет завершения задания в этом процессе, но не дольше timeout; задания других процессов
+        видны только при следующей проверке БД вызывающим кодом"""
+        entry = self._finished.get(job_id)
+        if entry is None:
+            entry = self._finished[job_id] = [asyncio.Event(), 0]
+        entry[1] += 1
+        try:
+            await asyncio.wait_for(entry[0].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            entry[1] -= 1
+            # Задание могло выполниться в другом процессе; событие удаляет последний ожидающий,
+            # остальные запросы того же задания продолжают его ждать
+            if entry[1] == 0 and self._finished.get(job_id) is entry:
+                del self._finished[job_id]
+
+    async def _worker(self):
+        while not self._stopping:
+            try:
+                job = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except (exc.SQLAlchemyError, OSError):
+                self.stats["errors"] += 1
+                logger.exception("Job claim failed")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            await self._run(job)
+
+    async def _claim(self):
+        async with AsyncSessionLocal() as db:
+            job = await jobs_repo.claim_job(db, datetime.now(timezone.utc), self.lease_seconds, self.max_attempts)
+        if job is not None:
+            self.stats["claimed"] += 1
+            if job.created_at is not None:
+                self.queue_wait.observe((datetime.now(timezone.utc) - _as_utc(job.created_at)).total_seconds())
+        return job
+
+    async def _run(self, job):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        self.stats["running"] += 1
+        result = error = None
+        try:
+            handler = self.handlers.get(job.kind)
+            if handler is None:
+                raise JobError(400, f"Unknown job kind: {job.kind}")
+            result = await asyncio.wait_for(handler(job.user_id, job.params), self.timeout)
+        except asyncio.CancelledError:
+            # Остановка воркера: задание не потеряно, его выполнит следующий воркер
+            await asyncio.shield(self._release(job))
+            raise
+        except asyncio.TimeoutError:
+            error = {"status_code": 504, "detail": f"Job timed out after {self.timeout:g}s"}
+        except JobError as e:
+            error = {"status_code": e.status_code, "detail": e.detail}
+        except Exception:
+            logger.exception(f"Job {job.id} failed")
+            error = {"status_code": 500, "detail": "Внутренняя ошибка сервера"}
+        finally:
+            self.stats["running"] -= 1
+        self.run_time.observe(loop.time() - started)
+
+        try:
+            async with AsyncSessionLocal() as db:
+                saved = await jobs_repo.finish_job(
+                    db, job.id, job.attempts, datetime.now(timezone.utc), result=result, error=error
+                )
+        except (exc.SQLAlchemyError, OSError):
+            # Результат не сохранен: по окончании аренды задание выполнится повторно
+            self.stats["errors"] += 1
+            logger.exception(f"Saving job {job.id} failed")
+            return
+        if not saved:
+            self.stats["lost"] += 1
+            return
+        self.stats["failed" if error is not None else "succeeded"] += 1
+        replica_router.mark_write(job.user_id)
+        entry = self._finished.pop(job.id, None)
+        if entry is not None:
+            entry[0].set()
+
+    async def _release(self, job):
+        try:
+            async with AsyncSessionLocal() as db:
+                await jobs_repo.release_job(db, job.id, job.attempts)
+            self.stats["released"] += 1
+        except (exc.SQLAlchemyError, OSError):
+            logger.exception(f"Releasing job {job.id} failed")
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            **self.stats,
+            "workers": sum(1 for task in self._tasks if not task.done()),
+            "queue_wait": self.queue_wait.snapshot(),
+            "run_time": self.run_time.snapshot(),
+        }
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite возвращает datetime без зоны; в PostgreSQL колонка timestamptz
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+job_queue = JobQueue(
+    concurrency=settings.jobs_concurrency,
+    poll_interval=settings.jobs_poll_seconds,
+    timeout=settings.jobs_timeout_seconds,
+    max_attempts=settings.jobs_max_attempts,
+)
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import random
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import HTTPException
+
+from ..config import settings
+from ..metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_latency = Histogram((0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0))
+_stats = {"calls": 0, "in_flight": 0, "retries": 0, "errors": 0, "image_timeouts": 0}
+_image_slots: Optional[asyncio.Semaphore] = None
+# user_id -> [семафор, число ожидающих и выполняющихся]; запись удаляется, когда у пользователя нет генераций
+_user_image_slots: Dict[int, list] = {}
+
+
+def get_openai_client():
+    """Один AsyncOpenAI с общим пулом HTTP-соединений на процесс; создается при первом запросе,
+    импорт SDK заметно замедляет старт воркера"""
+    global _client
+    if _client is None:
+        import httpx
+        from openai import AsyncOpenAI
+
+        # Проверка наличия API ключа
+        if not settings.openai_api_key:
+            raise ValueError("OpenAI API key is not set! Please check .env.gpt file")
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.openai_max_connections,
+                max_keepalive_connections=settings.openai_max_connections,
+            ),
+            timeout=httpx.Timeout(settings.openai_timeout_seconds, connect=settings.openai_connect_timeout_seconds),
+        )
+        # Повторы делает _call: у SDK свои без джиттера и без учета в метриках
+        _client = AsyncOpenAI(api_key=settings.openai_api_key, http_client=http_client, max_retries=0)
+    return _client
+
+
+async def close_openai_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def openai_error():
+    """Базовый класс ошибок SDK для except-веток, без импорта openai при загрузке модуля"""
+    from openai import OpenAIError
+    return OpenAIError
+
+
+def _retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """Пауза перед повтором или None, если ошибка не временная"""
+    import openai
+
+    if isinstance(error, openai.RateLimitError):
+        # Исчерпанная квота не восстановится за секунды
+        if _error_code(error) == "insufficient_quota":
+            return None
+    elif isinstance(error, openai.APIStatusError):
+        if error.status_code < 500:
+            return None
+    elif not isinstance(error, openai.APIConnectionError):
+        # APITimeoutError - подкласс APIConnectionError
+        return None
+
+    # Экспоненциальная пауза с полным джиттером, чтобы воркеры не повторяли запросы синхронно
+    delay = random.uniform(0, min(settings.openai_retry_max_seconds, settings.openai_retry_base_seconds * 2 ** attempt))
+    retry_after = _retry_after(error)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, settings.openai_retry_max_seconds))
+    return delay
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after", ""))
+    except ValueError:
+        return None
+
+
+def _error_code(error: Exception) -> Optional[str]:
+    code = getattr(error, "code", None)
+    if code:
+        return code
+    body = getattr(error, "body", None)
+    if isinstance(body, dict):
+        return body.get("code") or (body.get("error") or {}).get("code")
+    return None
+
+
+async def _call(method, timeout: float, **kwargs):
+    attempt = 0
+    _stats["calls"] += 1
+    _stats["in_flight"] += 1
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    try:
+        while True:
+            try:
+                return await method(timeout=timeout, **kwargs)
+            except openai_error() as e:
+                delay = _retry_delay(e, attempt) if attempt < settings.openai_max_retries else None
+                if delay is None:
+                    _stats["errors"] += 1
+                    raise
+                attempt += 1
+                _stats["retries"] += 1
+                logger.warning(f"OpenAI call failed ({type(e).__name__}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+    finally:
+        _stats["in_flight"] -= 1
+        _latency.observe(loop.time() - started)
+
+
+async def chat_completion(**kwargs):
+    """chat.completions.create с таймаутом и повторами"""
+    client = get_openai_client()
+    return await _call(client.chat.completions.create, settings.openai_timeout_seconds, **kwargs)
+
+
+async def chat_completion_stream(usage: Optional[Dict[str, int]] = None, **kwargs) -> AsyncIterator[str]:
+    """Потоковый chat.completions.create: отдает фрагменты текста по мере генерации.
+
+    Повторы - только до начала ответа, оборванный поток не повторяется. usage заполняется числом токенов
+    из последнего фрагмента потока.
+    """
+    client = get_openai_client()
+    stream = await _call(
+        client.chat.completions.create,
+        settings.openai_timeout_seconds,
+        stream=True,
+        stream_options={"include_usage": True},
+        **kwargs,
+    )
+    async with stream:
+        async for chunk in stream:
+            if chunk.usage is not None and usage is not None:
+                usage["total_tokens"] = chunk.usage.total_tokens
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+async def image_generation(**kwargs):
+    """images.generate с таймаутом и повторами"""
+    client = get_openai_client()
+    return await _call(client.images.generate, settings.openai_image_timeout_seconds, **kwargs)
+
+
+@asynccontextmanager
+async def image_slot(user_id: int):
+    """Место для генерации изображения: не больше IMAGE_GENERATION_CONCURRENCY на процесс
+    и IMAGE_GENERATION_PER_USER на пользователя"""
+    global _image_slots
+    if _image_slots is None:
+        _image_slots = asyncio.Semaphore(settings.image_generation_concurrency)
+    entry = _user_image_slots.get(user_id)
+    if entry is None:
+        entry = _user_image_slots[user_id] = [asyncio.Semaphore(settings.image_generation_per_user), 0]
+    entry[1] += 1
+    try:
+        # Сначала пользовательский лимит: ожидающие запросы одного пользователя не занимают общие места
+        async with entry[0], _image_slots:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _user_image_slots[user_id]
+
+
+def record_image_timeout():
+    _stats["image_timeouts"] += 1
+
+
+def llm_http_exception(error: Exception) -> HTTPException:
+    """Единое отображение ошибок OpenAI в HTTP-ответы"""
+    import openai
+
+    if isinstance(error, openai.AuthenticationError):
+        return HTTPException(status_code=500, detail="Invalid OpenAI API key. Please check your .env.gpt file")
+    if isinstance(error, openai.RateLimitError):
+        if _error_code(error) == "insufficient_quota":
+            return HTTPException(
+                status_code=429,
+                detail="OpenAI API quota exceeded. Please check your billing details at https://platform.openai.com/account/billing"
+            )
+        return HTTPException(status_code=429, detail="Rate limit exceeded. Please try again later")
+    if isinstance(error, openai.APITimeoutError):
+        return HTTPException(status_code=504, detail="OpenAI API timed out. Please try again later")
+    if isinstance(error, openai.APIConnectionError):
+        return HTTPException(status_code=502, detail="OpenAI API is unavailable. Please try again later")
+    if isinstance(error, openai.BadRequestError):
+        return HTTPException(status_code=400, detail=str(error))
+    if isinstance(error, openai.APIStatusError) and error.status_code >= 500:
+        return HTTPException(status_code=502, detail="OpenAI API error. Please try again later")
+    return HTTPException(status_code=500, detail=str(error))
+
+
+def llm_stats() -> Dict[str, Any]:
+    return {**_stats, "latency": _latency.snapshot()}
@@ -0,0 +1,52 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from ..config import BASE_DIR, settings
+
+MIGRATIONS_DIR = BASE_DIR / "migrations"
+ALEMBIC_INI = MIGRATIONS_DIR / "alembic.ini"
+
+# Ключ advisory lock, под которым миграции выполняет только один воркер
+MIGRATION_LOCK_ID = 7304211
+
+
+def _alembic_config(connection):
+    from alembic.config import Config
+
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(MIGRATIONS_DIR / "alembic"))
+    # env.py использует переданное соединение и не перенастраивает логирование приложения
+    config.attributes["connection"] = connection
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def _is_at_head(connection, config) -> bool:
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    heads = set(ScriptDirectory.from_config(config).get_heads())
+    current = set(MigrationContext.configure(connection).get_current_heads())
+    return current == heads
+
+
+def run_migrations() -> bool:
+    """Применяет миграции в текущем процессе; возвращает True, если что-то было применено"""
+    from alembic import command
+
+    engine = create_engine(settings.database_url, poolclass=NullPool)
+    try:
+        with engine.begin() as connection:
+            config = _alembic_config(connection)
+            # Дешевая проверка без блокировки: в штатном случае схема уже актуальна
+            if _is_at_head(connection, config):
+                return False
+            if connection.dialect.name == "postgresql":
+                # Остальные воркеры ждут здесь; блокировка снимается вместе с транзакцией
+                connection.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": MIGRATION_LOCK_ID})
+                if _is_at_head(connection, config):
+                    return False
+            command.upgrade(config, "head")
+            return True
+    finally:
+        engine.dispose()
@@ -0,0 +1,65 @@
+import hashlib
+import random
+import re
+import struct
+from typing import List, Optional
+
+# Сигнатура из ROWS * BANDS минимальных хешей; в LSH-индексе хранится по одной корзине на полосу.
+# При 10 полосах по 3 строки пара с похожестью 0.6 становится кандидатом с вероятностью ~0.9,
+# а с похожестью 0.2 - лишь ~0.08, поэтому проверяется малая доля постов компании
+BANDS = 10
+ROWS = 3
+NUM_PERM = BANDS * ROWS
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Фиксированное зерно: сигнатуры, сохраненные в БД, должны совпадать между процессами и релизами
+_random = random.Random(20261018)
+_PERMUTATIONS = [(_random.randrange(1, _PRIME), _random.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _shingles(text: str) -> set:
+    return {word for word in _WORD_RE.findall(text.lower()) if len(word) > 1}
+
+
+def signature(text: str) -> Optional[List[int]]:
+    """MinHash-сигнатура множества слов текста; None для текста без слов"""
+    shingles = _shingles(text)
+    if not shingles:
+        return None
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for shingle in shingles
+    ]
+    return [
+        min(((a * value + b) % _PRIME) & _MAX_HASH for value in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def post_signature(title: Optional[str], description: Optional[str]) -> Optional[List[int]]:
+    return signature(" ".join(filter(None, [title, description])))
+
+
+def pack(sig: List[int]) -> bytes:
+    return struct.pack(f">{NUM_PERM}I", *sig)
+
+
+def unpack(data: bytes) -> List[int]:
+    return list(struct.unpack(f">{NUM_PERM}I", data))
+
+
+def band_buckets(sig: List[int]) -> List[int]:
+    """Корзина каждой полосы - знаковый 64-битный хеш ее строк (BIGINT в PostgreSQL)"""
+    buckets = []
+    for band in range(BANDS):
+        rows = struct.pack(f">{ROWS}I", *sig[band * ROWS:(band + 1) * ROWS])
+        buckets.append(int.from_bytes(hashlib.blake2b(rows, digest_size=8).digest(), "big", signed=True))
+    return buckets
+
+
+def similarity(first: List[int], second: List[int]) -> float:
+    """Оценка коэффициента Жаккара по доле совпавших минимальных хешей"""
+    return sum(1 for left, right in zip(first, second) if left == right) / NUM_PERM
@@ -0,0 +1,142 @@
+import abc
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Request, status
+
+from ..config import settings
+
+
+class RateLimitBackend(abc.ABC):
+    """Хранилище состояния лимитера. По умолчанию в памяти процесса;
+    для общего лимита между воркерами подключается внешняя реализация (например, Redis).
+    Реализация без какого-либо из методов не создается: ошибка видна при старте, а не на первом входе"""
+
+    @abc.abstractmethod
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """Забирает токен из корзины; 0 - разрешено, иначе сколько секунд ждать"""
+
+    @abc.abstractmethod
+    async def blocked_for(self, key: str) -> float:
+        """Сколько секунд еще действует блокировка после неудачных попыток"""
+
+    @abc.abstractmethod
+    async def record_failure(self, key: str, threshold: int, base_delay: float, max_delay: float):
+        """Учитывает неудачную попытку; после threshold подряд включает блокировку"""
+
+    @abc.abstractmethod
+    async def reset_failures(self, key: str):
+        """Сбрасывает счетчик неудач после успешного входа"""
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+        self._failures: "OrderedDict[str, tuple[int, float]]" = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (float(burst), now))
+        tokens = min(float(burst), tokens + (now - updated_at) * rate)
+        if tokens < 1:
+            self._store(self._buckets, key, (tokens, now))
+            return (1 - tokens) / rate
+        self._store(self._buckets, key, (tokens - 1, now))
+        return 0.0
+
+    async def blocked_for(self, key: str) -> float:
+        _, blocked_until = self._failures.get(key, (0, 0.0))
+        return max(0.0, blocked_until - time.monotonic())
+
+    async def record_failure(self, key: str, threshold: int, base_delay: float, max_delay: float):
+        failures, blocked_until = self._failures.get(key, (0, 0.0))
+        failures += 1
+        if failures >= threshold:
+            # Экспоненциальная задержка: base, 2*base, 4*base ... но не больше max_delay
+            delay = min(max_delay, base_delay * 2 ** (failures - threshold))
+            blocked_until = time.monotonic() + delay
+        self._store(self._failures, key, (failures, blocked_until))
+
+    async def reset_failures(self, key: str):
+        self._failures.pop(key, None)
+
+    def _store(self, storage: OrderedDict, key: str, value):
+        storage[key] = value
+        storage.move_to_end(key)
+        # Ограничиваем память при переборе множества email/IP
+        while len(storage) > self.max_keys:
+            storage.popitem(last=False)
+
+
+class LoginThrottle:
+    """Ограничение попыток входа по email и IP, проверяется до поиска пользователя и bcrypt"""
+
+    def __init__(self, backend: RateLimitBackend):
+        self.backend = backend
+        self.stats: Dict[str, int] = {
+            "allowed": 0,
+            "rejected_ip": 0,
+            "rejected_email": 0,
+            "rejected_backoff": 0,
+            "failures": 0,
+        }
+
+    async def check(self, email: str, client_ip: Optional[str]):
+        email_key = f"email:{email.strip().lower()}"
+
+        retry_after = await self.backend.blocked_for(email_key)
+        if retry_after > 0:
+            self._reject("rejected_backoff", retry_after)
+
+        if client_ip is not None:
+            retry_after = await self.backend.take(
+                f"ip:{client_ip}", settings.login_ip_rate_per_minute / 60, settings.login_ip_burst
+            )
+            if retry_after > 0:
+                self._reject("rejected_ip", retry_after)
+
+        retry_after = await self.backend.take(
+            email_key, settings.login_email_rate_per_minute / 60, settings.login_email_burst
+        )
+        if retry_after > 0:
+            self._reject("rejected_email", retry_after)
+
+        self.stats["allowed"] += 1
+
+    async def record_failure(self, email: str):
+        self.stats["failures"] += 1
+        await self.backend.record_failure(
+            f"email:{email.strip().lower()}",
+            settings.login_backoff_threshold,
+            settings.login_backoff_base_seconds,
+            settings.login_backoff_max_seconds,
+        )
+
+    async def record_success(self, email: str):
+        await self.backend.reset_failures(f"email:{email.strip().lower()}")
+
+    def _reject(self, reason: str, retry_after: float):
+        self.stats[reason] += 1
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, please try again later",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
+
+
+login_throttle = LoginThrottle(InMemoryRateLimitBackend(settings.login_rate_limit_max_keys))
+
+
+def set_rate_limit_backend(backend: RateLimitBackend):
+    """Подключение общего хранилища, чтобы лимиты действовали на все воркеры"""
+    login_throttle.backend = backend
+
+
+def get_client_ip(request: Request) -> Optional[str]:
+    if settings.trust_forwarded_for:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else None
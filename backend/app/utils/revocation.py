@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database import AsyncSessionLocal
+from ..repositories import revoked_tokens as revoked_repo
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Фильтр Блума над jti: отсутствие в фильтре гарантирует, что токен не отозван"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """Денай-лист токенов: фильтр Блума в памяти перед таблицей revoked_tokens.
+
+    Фильтр инкрементально дополняется новыми записями из БД раз в refresh_interval,
+    поэтому отзыв на другом воркере виден здесь не позже чем через этот интервал.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, refresh_interval: float, rebuild_interval: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self._filter = BloomFilter(capacity, error_rate)
+        self._watermark: Optional[datetime] = None
+        self._refreshed_at = 0.0
+        self._rebuilt_at = 0.0
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self.stats: Dict[str, int] = {
+            "checks": 0,
+            "filter_hits": 0,
+            "revoked": 0,
+            "false_positives": 0,
+            "refreshes": 0,
+            "rebuilds": 0,
+            "expired_deleted": 0,
+        }
+
+    async def is_revoked(self, db: AsyncSession, jti: str) -> bool:
+        await self._ensure_fresh(db)
+        self.stats["checks"] += 1
+        if jti not in self._filter:
+            return False
+        # Фильтр может ошибаться только в сторону "отозван", подтверждаем по БД
+        self.stats["filter_hits"] += 1
+        if await revoked_repo.is_token_revoked(db, jti):
+            self.stats["revoked"] += 1
+            return True
+        self.stats["false_positives"] += 1
+        return False
+
+    async def revoke(self, db: AsyncSession, tokens: Iterable[Tuple[str, datetime, Optional[int]]]):
+        tokens = list(tokens)
+        await revoked_repo.add_revoked_tokens(db, tokens)
+        # Локально отзыв виден сразу, не дожидаясь следующего обновления
+        for jti, _, _ in tokens:
+            self._filter.add(jti)
+
+    async def _ensure_fresh(self, db: AsyncSession):
+        now = time.monotonic()
+        if self._loaded and now - self._refreshed_at < self.refresh_interval:
+            return
+        async with self._lock:
+            if self._loaded and time.monotonic() - self._refreshed_at < self.refresh_interval:
+                return
+            was_loaded = self._loaded
+            needs_rebuild = (
+                not self._loaded
+                or now - self._rebuilt_at >= self.rebuild_interval
+                or self._filter.count >= self.capacity
+            )
+            if needs_rebuild:
+                await self._rebuild(db)
+            else:
+                await self._refresh(db)
+            self._refreshed_at = time.monotonic()
+        # Чистка таблицы - раз в rebuild_interval, вне блокировки и не в сессии запроса
+        if needs_rebuild and was_loaded:
+            await self._delete_expired()
+
+    async def _refresh(self, db: AsyncSession):
+        # Перекрытие окна на случай транзакций, закоммиченных позже своего revoked_at
+        since = self._watermark - timedelta(seconds=self.refresh_interval * 2) if self._watermark else None
+        for jti, revoked_at in await revoked_repo.list_revoked_since(db, since):
+            self._filter.add(jti)
+            self._advance_watermark(revoked_at)
+        self.stats["refreshes"] += 1
+
+    async def _rebuild(self, db: AsyncSession):
+        """Полная пересборка отбрасывает истекшие токены, иначе фильтр со временем заполнится. Только чтение"""
+        rows = await revoked_repo.list_revoked_since(db, None)
+        self.capacity = max(self.capacity, len(rows) * 2)
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        watermark = None
+        for jti, revoked_at in rows:
+            bloom.add(jti)
+            if revoked_at is not None and (watermark is None or revoked_at > watermark):
+                watermark = revoked_at
+        self._filter = bloom
+        self._watermark = watermark
+        self._loaded = True
+        self._rebuilt_at = time.monotonic()
+        self.stats["rebuilds"] += 1
+
+    async def _delete_expired(self):
+        # Истекшие строки уже не попадают в фильтр; ошибка чистки не должна ломать проверку токена
+        try:
+            async with AsyncSessionLocal() as db:
+                self.stats["expired_deleted"] += await revoked_repo.delete_expired(db)
+        except (exc.SQLAlchemyError, OSError) as e:
+            logger.error(f"Revoked tokens cleanup failed: {e}")
+
+    def _advance_watermark(self, revoked_at: Optional[datetime]):
+        if revoked_at is not None and (self._watermark is None or revoked_at > self._watermark):
+            self._watermark = revoked_at
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            **self.stats,
+            "filter_size_bits": self._filter.size,
+            "filter_items": self._filter.count,
+        }
+
+
+revocation_list = RevocationList(
+    capacity=settings.revocation_filter_capacity,
+    error_rate=settings.revocation_filter_error_rate,
+    refresh_interval=settings.revocation_refresh_seconds,
+    rebuild_interval=settings.revocation_rebuild_seconds,
+)
+
+
+def expires_at_from_exp(exp: Optional[float]) -> datetime:
+    """exp из JWT в datetime; токены без exp держим в списке как обычные по длительности"""
+    if exp is None:
+        return datetime.now(timezone.utc) + timedelta(minutes=settings.access_token_expire_minutes)
+    return datetime.fromtimestamp(exp, tz=timezone.utc)
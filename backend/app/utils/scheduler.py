@@ -0,0 +1,130 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import exc
+
+from ..config import settings
+from ..database import AsyncSessionLocal, replica_router
+from ..metrics import Histogram
+from ..repositories import posts as posts_repo
+
+logger = logging.getLogger(__name__)
+
+# Задержка между запланированным и фактическим временем публикации (секунды)
+PUBLISH_LAG_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 300.0)
+
+
+class PublishScheduler:
+    """Фоновая публикация постов по scheduled_at.
+
+    Время следующего пробуждения берется из min-heap ближайших публикаций, поэтому
+    между ними нет постоянного опроса БД. Куча - только подсказка: посты захватываются
+    запросом с FOR UPDATE SKIP LOCKED, так что устаревшие записи (снятые или перенесенные
+    публикации) безвредны, а несколько воркеров не опубликуют один пост дважды.
+    Публикации, назначенные на других воркерах, подхватываются не позже чем через poll_interval.
+    """
+
+    def __init__(self, batch_size: int, poll_interval: float, prefetch: int):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.prefetch = prefetch
+        self._heap: List[Tuple[float, int]] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.lag = Histogram(PUBLISH_LAG_BUCKETS)
+        self.stats: Dict[str, int] = {
+            "published": 0,
+            "claims": 0,
+            "wakeups": 0,
+            "errors": 0,
+        }
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="publish-scheduler")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self, post_id: int, scheduled_at: datetime):
+        """Сообщает о новой публикации, назначенной в этом процессе"""
+        when = scheduled_at.timestamp()
+        if not self._heap or when < self._heap[0][0]:
+            # Новая публикация раньше текущего пробуждения - пересчитываем ожидание
+            self._wakeup.set()
+        heapq.heappush(self._heap, (when, post_id))
+
+    def _timeout(self) -> float:
+        if not self._heap:
+            return self.poll_interval
+        delay = self._heap[0][0] - datetime.now(timezone.utc).timestamp()
+        return min(max(delay, 0.0), self.poll_interval)
+
+    async def _run(self):
+        while True:
+            try:
+                await self._publish_due()
+                await self._reload()
+            except asyncio.CancelledError:
+                raise
+            except (exc.SQLAlchemyError, OSError):
+                # БД недоступна - повторим на следующем пробуждении
+                self.stats["errors"] += 1
+                logger.exception("Scheduled publishing failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._timeout())
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            self.stats["wakeups"] += 1
+
+    async def _publish_due(self):
+        while True:
+            now = datetime.now(timezone.utc)
+            async with AsyncSessionLocal() as db:
+                published = await posts_repo.claim_due_posts(db, now, self.batch_size)
+            self.stats["claims"] += 1
+            for _, user_id, scheduled_at in published:
+                self.lag.observe(max((now - _as_utc(scheduled_at)).total_seconds(), 0.0))
+                replica_router.mark_write(user_id)
+            self.stats["published"] += len(published)
+            # Полный пакет - возможно, есть еще просроченные посты
+            if len(published) < self.batch_size:
+                return
+
+    async def _reload(self):
+        """Перестраивает кучу по ближайшим публикациям из БД"""
+        async with AsyncSessionLocal() as db:
+            upcoming = await posts_repo.list_upcoming_schedule(db, datetime.now(timezone.utc), self.prefetch)
+        self._heap = [(_as_utc(scheduled_at).timestamp(), post_id) for post_id, scheduled_at in upcoming]
+        heapq.heapify(self._heap)
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            **self.stats,
+            "running": self._task is not None and not self._task.done(),
+            "pending_in_heap": len(self._heap),
+            "next_wakeup_in": round(self._timeout(), 3),
+            "publish_lag": self.lag.snapshot(),
+        }
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite возвращает datetime без зоны; в PostgreSQL колонка timestamptz
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+publish_scheduler = PublishScheduler(
+    batch_size=settings.scheduler_batch_size,
+    poll_interval=settings.scheduler_poll_seconds,
+    prefetch=settings.scheduler_prefetch,
+)
@@ -0,0 +1,122 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # nginx не должен копить поток событий в буфере
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(event: str, data: Any) -> bytes:
+    """Событие Server-Sent Events с JSON в data"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+class _Frame:
+    __slots__ = ("is_object", "key", "index", "expect_key")
+
+    def __init__(self, is_object: bool):
+        self.is_object = is_object
+        self.key: Optional[str] = None
+        self.index = 0
+        self.expect_key = is_object
+
+    @property
+    def position(self):
+        return self.key if self.is_object else self.index
+
+
+class JsonStreamParser:
+    """Инкрементальный разбор JSON-объекта, приходящего по частям (потоковый ответ модели).
+
+    feed() возвращает значения, которые успели прийти целиком, с путем от корня:
+    (("title",), "...") - поле корневого объекта, (("ideas", 0), {...}) - элемент вложенного массива.
+    Отдаются значения не глубже max_depth; сам корневой объект - через result() после конца потока.
+    """
+
+    def __init__(self, max_depth: int = 2):
+        self.max_depth = max_depth
+        self._text = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._open = {}  # глубина -> (начало значения, путь)
+        self._in_string = False
+        self._string_is_key = False
+        self._key_start = 0
+        self._escape = False
+        self._scalar_depth: Optional[int] = None
+        self._result = None
+
+    def feed(self, chunk: str) -> List[Tuple[tuple, Any]]:
+        events = []
+        self._text += chunk
+        text = self._text
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._string_is_key:
+                        self._stack[-1].key = json.loads(text[self._key_start:i + 1])
+                    else:
+                        self._end_value(i + 1, events)
+                continue
+            if char in " \t\r\n":
+                continue
+            if char == '"':
+                self._in_string = True
+                top = self._stack[-1] if self._stack else None
+                self._string_is_key = bool(top and top.is_object and top.expect_key)
+                if self._string_is_key:
+                    self._key_start = i
+                else:
+                    self._start_value(i)
+            elif char == ":":
+                self._stack[-1].expect_key = False
+            elif char == ",":
+                self._end_scalar(i, events)
+                top = self._stack[-1]
+                if top.is_object:
+                    top.expect_key = True
+                else:
+                    top.index += 1
+            elif char in "{[":
+                self._start_value(i)
+                self._stack.append(_Frame(char == "{"))
+            elif char in "}]":
+                self._end_scalar(i, events)
+                self._stack.pop()
+                self._end_value(i + 1, events)
+            elif self._scalar_depth is None:
+                # Число, true, false или null: конец виден только по следующему разделителю
+                self._start_value(i)
+                self._scalar_depth = len(self._stack)
+        self._pos = len(text)
+        return events
+
+    def result(self) -> Any:
+        """Весь объект; ValueError, если поток оборвался раньше конца JSON"""
+        if self._result is None:
+            raise ValueError("Incomplete JSON")
+        return self._result
+
+    def _start_value(self, start: int):
+        path = tuple(frame.position for frame in self._stack)
+        self._open[len(self._stack)] = (start, path)
+
+    def _end_scalar(self, end: int, events: list):
+        if self._scalar_depth is not None:
+            self._scalar_depth = None
+            self._end_value(end, events)
+
+    def _end_value(self, end: int, events: list):
+        start, path = self._open.pop(len(self._stack))
+        if not path:
+            self._result = json.loads(self._text[start:end])
+        elif len(path) <= self.max_depth:
+            events.append((path, json.loads(self._text[start:end])))
@@ -0,0 +1,81 @@
+"""Нагрузочный замер основных эндпоинтов API (запросов в секунду).
+
+Запускается против работающего сервера с локальным PostgreSQL, например:
+
+    uvicorn app.main:app --workers 1
+    python benchmarks/bench_api.py --url http://localhost:8000 --concurrency 50 --duration 20
+
+Для сравнения "до/после" прогоните скрипт на двух ревизиях с одинаковыми параметрами.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+ENDPOINTS = ["/auth/me", "/companies/", "/posts/"]
+
+
+async def prepare_user(client: httpx.AsyncClient) -> str:
+    """Регистрирует пользователя с компанией и постом, возвращает токен"""
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    password = "bench-password"
+    (await client.post("/auth/register", json={"email": email, "password": password})).raise_for_status()
+    response = await client.post("/auth/login", data={"username": email, "password": password})
+    response.raise_for_status()
+    token = response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    await client.post("/companies/create", headers=headers, json={
+        "name": "Bench", "industry": "Retail", "region": "Moscow", "short_about": "bench",
+    })
+    await client.post("/posts/", headers=headers, json={
+        "company_name": "Bench", "business_type": "Retail", "region": "Moscow", "language": "ru",
+        "title": "Bench post", "description": "Bench description", "benefits": ["fast"],
+        "hashtags": ["#bench"], "image_prompt": "bench", "image_base64": None,
+    })
+    return token
+
+
+async def worker(client: httpx.AsyncClient, path: str, headers: dict, deadline: float, latencies: list, errors: list):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.get(path, headers=headers)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append(time.perf_counter() - started)
+
+
+async def bench(url: str, concurrency: int, duration: float):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        token = await prepare_user(client)
+        headers = {"Authorization": f"Bearer {token}"}
+        for path in ENDPOINTS:
+            latencies, errors = [], []
+            deadline = time.perf_counter() + duration
+            started = time.perf_counter()
+            await asyncio.gather(*[
+                worker(client, path, headers, deadline, latencies, errors) for _ in range(concurrency)
+            ])
+            elapsed = time.perf_counter() - started
+            latencies.sort()
+            p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+            print(
+                f"{path:<14} {len(latencies) / elapsed:8.1f} req/s  "
+                f"p50 {statistics.median(latencies) * 1000 if latencies else 0:7.1f} ms  "
+                f"p95 {p95 * 1000:7.1f} ms  errors {len(errors)}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=20.0)
+    args = parser.parse_args()
+    asyncio.run(bench(args.url, args.concurrency, args.duration))
@@ -0,0 +1,73 @@
+"""Замер обработки изображений: уменьшение размера и время кодирования.
+
+Без аргументов использует синтетические изображения 1024x1024 (как у DALL-E), можно передать свои файлы:
+
+    python benchmarks/bench_images.py
+    python benchmarks/bench_images.py --format jpeg --quality 75 samples/*.png
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+from PIL import Image, ImageDraw, ImageFilter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.utils.images import OUTPUT_FORMATS, process_image_sync  # noqa: E402
+
+
+def synthetic_images():
+    """Градиент с фигурами и шумом: PNG такого вида сжимается примерно как фотореалистичная генерация"""
+    samples = {}
+    gradient = Image.linear_gradient("L").resize((1024, 1024))
+    image = Image.merge("RGB", (gradient, gradient.rotate(90), gradient.rotate(180)))
+    draw = ImageDraw.Draw(image)
+    for index in range(12):
+        offset = index * 70
+        draw.ellipse((offset, offset // 2, offset + 260, offset // 2 + 260), fill=(40 * index % 255, 120, 200 - index * 10))
+    noise = Image.effect_noise((1024, 1024), 40).convert("RGB")
+    samples["photo-like"] = Image.blend(image, noise, 0.25).filter(ImageFilter.SMOOTH)
+    samples["flat-illustration"] = image
+    result = {}
+    for name, sample in samples.items():
+        buffer = io.BytesIO()
+        sample.save(buffer, format="PNG")
+        result[name] = buffer.getvalue()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--format", default="webp", choices=sorted(OUTPUT_FORMATS))
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--max-side", type=int, default=1024)
+    parser.add_argument("--thumbnails", default="256,512")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.files:
+        samples = {os.path.basename(path): open(path, "rb").read() for path in args.files}
+    else:
+        samples = synthetic_images()
+    thumbnail_sizes = tuple(int(size) for size in args.thumbnails.split(",") if size)
+
+    for name, data in samples.items():
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            result = process_image_sync(data, OUTPUT_FORMATS[args.format], args.quality, args.max_side, thumbnail_sizes)
+            timings.append(time.perf_counter() - started)
+        thumbnails = ", ".join(f"{size}px {len(body) // 1024} KB" for size, body in result["thumbnails"].items())
+        print(
+            f"{name:<20} {len(data) // 1024:6d} KB -> {len(result['image']) // 1024:5d} KB "
+            f"({100 * (len(result['image']) / len(data) - 1):+.0f}%)  "
+            f"encode p50 {statistics.median(timings) * 1000:6.1f} ms  thumbnails: {thumbnails}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Замер объема ответов: без сжатия, gzip, brotli и повторный запрос с If-None-Match (304).
+
+Запускается против работающего сервера, например:
+
+    uvicorn app.main:app --workers 1
+    python benchmarks/bench_transfer.py --url http://localhost:8000 --posts 50
+"""
+import argparse
+import asyncio
+
+import httpx
+
+from bench_api import prepare_user
+
+ENCODINGS = ["identity", "gzip", "br"]
+
+
+async def seed_posts(client: httpx.AsyncClient, headers: dict, count: int):
+    post = {
+        "company_name": "Bench", "business_type": "Retail", "region": "Moscow", "language": "ru",
+        "title": "Осенняя распродажа", "description": "Скидки до 50% на всю коллекцию. " * 20,
+        "benefits": ["быстрая доставка", "гарантия"], "hashtags": ["#sale", "#autumn"],
+        "image_prompt": "bench", "image_base64": None,
+    }
+    (await client.post("/posts/batch", headers=headers, json=[post] * count)).raise_for_status()
+
+
+async def wire_size(client: httpx.AsyncClient, path: str, headers: dict) -> tuple:
+    """Размер тела на проводе (до распаковки) и ответ"""
+    async with client.stream("GET", path, headers=headers) as response:
+        size = 0
+        async for chunk in response.aiter_raw():
+            size += len(chunk)
+    return size, response
+
+
+async def bench(url: str, posts: int):
+    async with httpx.AsyncClient(base_url=url, timeout=30) as client:
+        token = await prepare_user(client)
+        auth = {"Authorization": f"Bearer {token}"}
+        await seed_posts(client, auth, posts)
+        first_id = (await client.get("/posts/?limit=1", headers=auth)).json()["items"][0]["id"]
+        for path in ["/posts/?limit=100", f"/posts/{first_id}", "/companies/"]:
+            sizes = {}
+            etag = None
+            for encoding in ENCODINGS:
+                size, response = await wire_size(client, path, {**auth, "Accept-Encoding": encoding})
+                used = response.headers.get("content-encoding", "identity")
+                sizes[encoding] = size if used == encoding else None
+                etag = etag or response.headers.get("etag")
+            revalidated = None
+            if etag:
+                size, response = await wire_size(client, path, {**auth, "If-None-Match": etag})
+                revalidated = (response.status_code, size)
+
+            identity = sizes["identity"]
+            parts = [f"{path:<20} identity {identity:8d} B"]
+            for encoding in ENCODINGS[1:]:
+                if sizes[encoding] is None:
+                    parts.append(f"{encoding} n/a")
+                else:
+                    saved = 100 * (1 - sizes[encoding] / identity) if identity else 0.0
+                    parts.append(f"{encoding} {sizes[encoding]:7d} B (-{saved:.0f}%)")
+            if revalidated:
+                parts.append(f"If-None-Match -> {revalidated[0]}, {revalidated[1]} B")
+            print("  ".join(parts))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--posts", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(bench(args.url, args.posts))
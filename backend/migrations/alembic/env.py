@@ -15,7 +15,8 @@ config = context.config
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-if config.config_file_name is not None:
+# При запуске из приложения логирование уже настроено, его не трогаем
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
     fileConfig(config.config_file_name)
 
 # add your model's MetaData object here
@@ -23,7 +24,7 @@ if config.config_file_name is not None:
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
 from app.database import Base
-from app.models.models import User, Company, SocialMediaAccount, Post
+from app.models.models import User, Company, SocialMediaAccount, Post, RevokedToken, PostDailyStat, PostHashtagStat, PostSimilarityBand, GenerationCacheEntry, GenerationJob
 
 target_metadata = Base.metadata
 
@@ -72,6 +73,20 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
+    # Приложение передает свое соединение (под advisory lock), ошибки не маскируем
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            compare_type=True,
+            include_schemas=True
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
     # Если нет соединения с БД, используем offline-режим
     try:
         connectable = engine_from_config(
@@ -0,0 +1,31 @@
+"""post image hash
+
+Revision ID: 5c2e8d4f7b21
+Revises: 3b1f7c2d9a10
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2e8d4f7b21'
+down_revision: Union[str, None] = '3b1f7c2d9a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Сами изображения переносит из image_base64 команда python -m app.commands.migrate_images
+    op.add_column('posts', sa.Column('image_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_posts_image_hash'), 'posts', ['image_hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_posts_image_hash'), table_name='posts')
+    op.drop_column('posts', 'image_hash')
@@ -0,0 +1,30 @@
+"""user scoped indexes
+
+Revision ID: 7d3a9e1b5c42
+Revises: 5c2e8d4f7b21
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d3a9e1b5c42'
+down_revision: Union[str, None] = '5c2e8d4f7b21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Покрывает и фильтр по user_id, и keyset-пагинацию GET /posts/
+    op.create_index('ix_posts_user_id_created_at_id', 'posts', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_companies_user_id', 'companies', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_companies_user_id', table_name='companies')
+    op.drop_index('ix_posts_user_id_created_at_id', table_name='posts')
@@ -0,0 +1,37 @@
+"""post scheduled at
+
+Revision ID: 9e4b2c7a1d63
+Revises: 7d3a9e1b5c42
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4b2c7a1d63'
+down_revision: Union[str, None] = '7d3a9e1b5c42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('posts', sa.Column('scheduled_at', sa.DateTime(timezone=True), nullable=True))
+    # Частичный индекс: опубликованные и незапланированные посты в него не попадают
+    op.create_index(
+        'ix_posts_scheduled_at_unpublished',
+        'posts',
+        ['scheduled_at'],
+        unique=False,
+        postgresql_where=sa.text('scheduled_at IS NOT NULL AND NOT is_published'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_posts_scheduled_at_unpublished', table_name='posts')
+    op.drop_column('posts', 'scheduled_at')
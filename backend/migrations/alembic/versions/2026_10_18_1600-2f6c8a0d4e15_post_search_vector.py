@@ -0,0 +1,65 @@
+"""post search vector
+
+Revision ID: 2f6c8a0d4e15
+Revises: 9e4b2c7a1d63
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2f6c8a0d4e15'
+down_revision: Union[str, None] = '9e4b2c7a1d63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Конфигурация поиска по Post.language (совпадает с SEARCH_CONFIGS в моделях на момент миграции)
+SEARCH_CONFIG = (
+    "CASE WHEN lower(language) IN ('ru', 'rus', 'russian', 'русский') THEN 'russian'::regconfig "
+    "WHEN lower(language) IN ('en', 'eng', 'english', 'английский') THEN 'english'::regconfig "
+    "ELSE 'simple'::regconfig END"
+)
+
+SEARCH_VECTOR = (
+    f"setweight(to_tsvector({SEARCH_CONFIG}, coalesce(title, '')), 'A') || "
+    "setweight(jsonb_to_tsvector('simple', coalesce(hashtags, '[]'::jsonb), '[\"string\"]'), 'B') || "
+    f"setweight(to_tsvector({SEARCH_CONFIG}, coalesce(description, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # jsonb нужен для GIN-индекса и оператора @> по хештегам
+    op.alter_column(
+        'posts', 'hashtags',
+        type_=postgresql.JSONB(),
+        existing_type=sa.JSON(),
+        postgresql_using='hashtags::jsonb',
+    )
+    op.add_column(
+        'posts',
+        sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR, persisted=True), nullable=True),
+    )
+    op.create_index('ix_posts_search_vector', 'posts', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index(
+        'ix_posts_hashtags', 'posts', ['hashtags'], unique=False,
+        postgresql_using='gin', postgresql_ops={'hashtags': 'jsonb_path_ops'},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_posts_hashtags', table_name='posts')
+    op.drop_index('ix_posts_search_vector', table_name='posts')
+    op.drop_column('posts', 'search_vector')
+    op.alter_column(
+        'posts', 'hashtags',
+        type_=sa.JSON(),
+        existing_type=postgresql.JSONB(),
+        postgresql_using='hashtags::json',
+    )
@@ -0,0 +1,48 @@
+"""analytics rollups
+
+Revision ID: 4a8d1f3b6c27
+Revises: 2f6c8a0d4e15
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a8d1f3b6c27'
+down_revision: Union[str, None] = '2f6c8a0d4e15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Существующие посты переносятся в агрегаты командой python -m app.commands.backfill_analytics
+    op.create_table('post_daily_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('company_name', sa.String(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('created_count', sa.Integer(), nullable=False),
+    sa.Column('published_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'company_name', 'day')
+    )
+    op.create_table('post_hashtag_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('company_name', sa.String(), nullable=False),
+    sa.Column('hashtag', sa.String(), nullable=False),
+    sa.Column('post_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'company_name', 'hashtag')
+    )
+    op.create_index('ix_post_hashtag_stats_top', 'post_hashtag_stats', ['user_id', 'company_name', 'post_count'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_post_hashtag_stats_top', table_name='post_hashtag_stats')
+    op.drop_table('post_hashtag_stats')
+    op.drop_table('post_daily_stats')
@@ -0,0 +1,28 @@
+"""post thumbnails
+
+Revision ID: 6b9e3d5f8a42
+Revises: 4a8d1f3b6c27
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b9e3d5f8a42'
+down_revision: Union[str, None] = '4a8d1f3b6c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('posts', sa.Column('thumbnails', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('posts', 'thumbnails')
@@ -0,0 +1,42 @@
+"""post similarity index
+
+Revision ID: 8c1f4e6a2b93
+Revises: 6b9e3d5f8a42
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c1f4e6a2b93'
+down_revision: Union[str, None] = '6b9e3d5f8a42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Сигнатуры существующих постов строит команда python -m app.commands.index_similarity
+    op.add_column('posts', sa.Column('minhash', sa.LargeBinary(), nullable=True))
+    op.create_table('post_similarity_bands',
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('band', sa.SmallInteger(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('company_name', sa.String(), nullable=False),
+    sa.Column('bucket', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('post_id', 'band')
+    )
+    op.create_index('ix_post_similarity_bands_lookup', 'post_similarity_bands', ['user_id', 'company_name', 'band', 'bucket'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_post_similarity_bands_lookup', table_name='post_similarity_bands')
+    op.drop_table('post_similarity_bands')
+    op.drop_column('posts', 'minhash')
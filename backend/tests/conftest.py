@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+# Тесты с PostgreSQL запускаются только с TEST_DATABASE_URL: база очищается и заполняется заново.
+# Настройки приложения читают DATABASE_URL при импорте, поэтому подменяем его до импорта app
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+
+# Объем тестовых данных: при меньшем планировщику выгоднее полный просмотр таблиц, чем индексы
+SEED_USERS = 2000
+SEED_POSTS_PER_USER = 25
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def seeded_db():
+    """Схема из моделей и данные: SEED_USERS пользователей, у каждого компания и SEED_POSTS_PER_USER постов"""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.pool import NullPool
+
+    from app.database import Base
+    from app.models import models  # noqa: F401 - регистрирует таблицы в Base.metadata
+    from app.utils.auth import get_password_hash
+
+    engine = create_engine(TEST_DATABASE_URL, poolclass=NullPool)
+    try:
+        with engine.begin() as connection:
+            Base.metadata.drop_all(connection)
+            Base.metadata.create_all(connection)
+            connection.execute(
+                text(
+                    "INSERT INTO users (email, hashed_password, is_active, is_admin, created_at, updated_at) "
+                    "SELECT 'user' || n || '@example.com', :password, true, false, now(), now() "
+                    "FROM generate_series(1, :users) AS n"
+                ),
+                {"password": get_password_hash("password"), "users": SEED_USERS},
+            )
+            connection.execute(
+                text(
+                    "INSERT INTO companies (name, industry, region, short_about, user_id, created_at, updated_at) "
+                    "SELECT 'Company ' || id, 'Retail', 'Moscow', 'About', id, now(), now() FROM users"
+                )
+            )
+            connection.execute(
+                text(
+                    "INSERT INTO posts (user_id, company_name, business_type, region, language, title, description, "
+                    "benefits, hashtags, is_published, created_at) "
+                    "SELECT u.id, 'Company ' || u.id, 'Retail', 'Moscow', 'ru', 'Post ' || n, 'Description ' || n, "
+                    "'[]'::json, '[\"#sale\"]'::jsonb, n % 2 = 0, now() - n * interval '1 hour' "
+                    "FROM users AS u CROSS JOIN generate_series(1, :posts) AS n"
+                ),
+                {"posts": SEED_POSTS_PER_USER},
+            )
+        with engine.connect() as connection:
+            connection.execution_options(isolation_level="AUTOCOMMIT").execute(text("ANALYZE"))
+        yield
+    finally:
+        engine.dispose()
+
+
+@pytest.fixture
+async def api_client(seeded_db):
+    import httpx
+
+    from app.database import dispose_engines
+    from app.main import app
+    from app.utils.principal_cache import principal_cache
+
+    principal_cache.clear()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    # Соединения пула привязаны к циклу событий теста
+    await dispose_engines()
+
@@ -0,0 +1,161 @@
+import gzip
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request, Response
+
+from app.compression import CompressionMiddleware
+from app.utils.conditional import conditional_response, make_etag
+
+pytestmark = pytest.mark.anyio
+
+MINIMUM_SIZE = 1024
+LARGE_ITEMS = [{"id": index, "title": f"Пост {index}"} for index in range(200)]
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=MINIMUM_SIZE)
+
+
+@app.get("/large")
+async def large(request: Request, response: Response):
+    not_modified = conditional_response(request, response, make_etag("large", 1))
+    if not_modified is not None:
+        return not_modified
+    return LARGE_ITEMS
+
+
+@app.get("/small")
+async def small():
+    return {"ok": True}
+
+
+@app.get("/image")
+async def image():
+    return Response(b"\x89PNG\r\n\x1a\n" + b"\0" * 4096, media_type="image/png")
+
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        ("gzip", "gzip"),
+        ("gzip, deflate", "gzip"),
+        ("br;q=0, gzip", "gzip"),
+        ("gzip;q=0", None),
+        ("identity", None),
+    ],
+)
+async def test_negotiates_gzip(client, accept_encoding, expected):
+    response = await client.get("/large", headers={"Accept-Encoding": accept_encoding})
+
+    assert response.headers.get("content-encoding") == expected
+    # httpx распаковывает тело сам
+    assert response.json() == LARGE_ITEMS
+
+
+async def test_gzip_body_is_valid_gzip(client):
+    async with client.stream("GET", "/large", headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join([chunk async for chunk in response.aiter_raw()])
+
+    assert int(response.headers["content-length"]) == len(raw)
+    assert json.loads(gzip.decompress(raw)) == LARGE_ITEMS
+
+
+async def wire_size(client, url: str, accept_encoding: str, headers: dict = None) -> int:
+    """Размер тела на проводе, до распаковки"""
+    headers = {**(headers or {}), "Accept-Encoding": accept_encoding}
+    async with client.stream("GET", url, headers=headers) as response:
+        assert response.status_code == 200
+        assert response.headers.get("content-encoding", "identity") == accept_encoding
+        return len(b"".join([chunk async for chunk in response.aiter_raw()]))
+
+
+async def assert_compression_saves_bytes(client, url: str, headers: dict = None):
+    pytest.importorskip("brotli")
+    identity = await wire_size(client, url, "identity", headers)
+    for coding in ("gzip", "br"):
+        assert await wire_size(client, url, coding, headers) < identity, coding
+
+
+async def test_compression_saves_bytes(client):
+    await assert_compression_saves_bytes(client, "/large")
+
+
+async def test_post_list_compression_saves_bytes(api_client):
+    from app.utils.auth import create_access_token
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'user7@example.com'})}"}
+    response = await api_client.get("/posts/?limit=25", headers=headers)
+    # Маршрут с ETag: сжатие не должно ломать условные запросы
+    assert response.headers["etag"].startswith('W/"')
+
+    await assert_compression_saves_bytes(api_client, "/posts/?limit=25", headers)
+
+
+async def test_prefers_brotli(client):
+    pytest.importorskip("brotli")
+    response = await client.get("/large", headers={"Accept-Encoding": "gzip, br"})
+
+    assert response.headers["content-encoding"] == "br"
+    assert response.json() == LARGE_ITEMS
+
+
+async def test_skips_small_responses(client):
+    response = await client.get("/small", headers={"Accept-Encoding": "gzip, br"})
+
+    assert "content-encoding" not in response.headers
+    assert "accept-encoding" not in response.headers.get("vary", "").lower()
+    assert response.json() == {"ok": True}
+
+
+async def test_skips_images(client):
+    response = await client.get("/image", headers={"Accept-Encoding": "gzip, br"})
+
+    assert "content-encoding" not in response.headers
+    assert len(response.content) > MINIMUM_SIZE
+
+
+async def test_compressed_response_varies_by_accept_encoding(client):
+    response = await client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    vary = [value.strip().lower() for value in response.headers["vary"].split(",")]
+    assert "accept-encoding" in vary
+    # Vary: Authorization из conditional_response сохраняется
+    assert "authorization" in vary
+
+
+@pytest.mark.parametrize("accept_encoding", ["gzip", "identity"])
+async def test_if_none_match_round_trip(client, accept_encoding):
+    headers = {"Accept-Encoding": accept_encoding}
+    response = await client.get("/large", headers=headers)
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+
+    not_modified = await client.get("/large", headers={**headers, "If-None-Match": etag})
+
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    # 304 не сжимается, но валидатор тот же, что и у сжатого 200
+    assert not_modified.headers["etag"] == etag
+    assert "content-encoding" not in not_modified.headers
+
+
+async def test_strong_if_none_match_matches_weakly(client):
+    etag = (await client.get("/large", headers={"Accept-Encoding": "gzip"})).headers["etag"]
+
+    response = await client.get("/large", headers={"If-None-Match": etag[2:]})
+
+    assert response.status_code == 304
+
+
+async def test_changed_resource_is_sent_again(client):
+    response = await client.get("/large", headers={"Accept-Encoding": "gzip", "If-None-Match": 'W/"stale"'})
+
+    assert response.status_code == 200
+    assert response.json() == LARGE_ITEMS
@@ -0,0 +1,89 @@
+import io
+import time
+
+import pytest
+from PIL import Image
+
+from app.config import settings
+from app.utils import images
+
+pytestmark = pytest.mark.anyio
+
+MAX_SIDE = 512
+THUMBNAIL_SIZES = "128,256"
+# Кодирование примера с миниатюрами сейчас занимает десятые доли секунды; запас - на медленные CI
+ENCODE_BUDGET_SECONDS = 5.0
+
+
+def sample_png(width: int = 1200, height: int = 900) -> bytes:
+    # Шум поверх градиентов, как у фотографии: PNG без потерь заметно больше WebP и JPEG
+    size = (width, height)
+    channels = [
+        Image.linear_gradient("L").resize(size),
+        Image.radial_gradient("L").resize(size),
+        Image.effect_noise(size, 24),
+    ]
+    output = io.BytesIO()
+    Image.merge("RGB", channels).save(output, format="PNG")
+    return output.getvalue()
+
+
+@pytest.fixture(scope="module", autouse=True)
+def executor():
+    # Запуск spawn-процесса занимает секунды: один пул на все тесты модуля
+    yield
+    images.shutdown_executor()
+
+
+@pytest.fixture(scope="module")
+def png():
+    return sample_png()
+
+
+@pytest.fixture
+def image_settings(monkeypatch):
+    monkeypatch.setattr(settings, "image_max_side", MAX_SIDE)
+    monkeypatch.setattr(settings, "image_thumbnail_sizes", THUMBNAIL_SIZES)
+    monkeypatch.setattr(settings, "image_workers", 1)
+
+
+@pytest.mark.parametrize("image_format, pillow_format", [("webp", "WEBP"), ("jpeg", "JPEG")])
+async def test_process_image_recompresses_and_resizes(
+    monkeypatch, record_property, image_settings, png, image_format, pillow_format
+):
+    monkeypatch.setattr(settings, "image_format", image_format)
+
+    started = time.perf_counter()
+    result = await images.process_image(png)
+    # Включает запуск процесса пула при первом вызове
+    wall_seconds = time.perf_counter() - started
+
+    size_ratio = len(result["image"]) / len(png)
+    record_property("size_ratio", round(size_ratio, 3))
+    record_property("encode_seconds", round(result["encode_seconds"], 3))
+    record_property("wall_seconds", round(wall_seconds, 3))
+    print(
+        f"{image_format}: {len(png)} -> {len(result['image'])} bytes (x{size_ratio:.3f}), "
+        f"encode {result['encode_seconds'] * 1000:.0f} ms, wall {wall_seconds * 1000:.0f} ms"
+    )
+    assert size_ratio < 1.0
+    assert result["encode_seconds"] < ENCODE_BUDGET_SECONDS
+    with Image.open(io.BytesIO(result["image"])) as image:
+        assert image.format == pillow_format
+        assert max(image.size) == MAX_SIDE
+        # Пропорции сохраняются
+        assert image.size == (MAX_SIDE, MAX_SIDE * 3 // 4)
+    assert sorted(result["thumbnails"]) == [128, 256]
+    for size, thumbnail in result["thumbnails"].items():
+        with Image.open(io.BytesIO(thumbnail)) as image:
+            assert image.format == pillow_format
+            assert max(image.size) == size
+
+
+async def test_process_pool_uses_spawn(image_settings):
+    assert images.get_executor()._mp_context.get_start_method() == "spawn"
+
+
+async def test_invalid_image_is_rejected(image_settings):
+    with pytest.raises(ValueError):
+        await images.process_image(b"not an image")
@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Сейчас импорт занимает ~1.8 с (почти все - fastapi); до отложенной инициализации было ~3.3 с, из них ~1.5 с - openai
+IMPORT_BUDGET_SECONDS = 3.0
+
+CHECK_SCRIPT = """
+import json, logging, sys
+import app.main
+handlers = [logging.getLogger()] + [
+    logger for logger in logging.Logger.manager.loggerDict.values() if isinstance(logger, logging.Logger)
+]
+print(json.dumps({
+    "openai": "openai" in sys.modules,
+    "file_handlers": sum(
+        isinstance(handler, logging.FileHandler) for logger in handlers for handler in logger.handlers
+    ),
+}))
+"""
+
+
+def import_app(tmp_path):
+    log_file = tmp_path / "chatgpt_api.log"
+    env = {**os.environ, "AI_LOG_FILE": str(log_file)}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHECK_SCRIPT],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result, log_file
+
+
+def cumulative_seconds(importtime_log: str, module: str) -> float:
+    # Строки -X importtime: "import time: self [us] | cumulative | imported package"
+    for line in importtime_log.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1_000_000
+    raise AssertionError(f"{module} not found in -X importtime output")
+
+
+def test_import_is_fast_and_side_effect_free(tmp_path):
+    result, log_file = import_app(tmp_path)
+    state = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert cumulative_seconds(result.stderr, "app.main") < IMPORT_BUDGET_SECONDS
+    # SDK OpenAI импортируется при первом запросе к модели
+    assert not state["openai"]
+    # Файловый лог подключается в lifespan, а не при импорте
+    assert state["file_handlers"] == 0
+    assert not log_file.exists()
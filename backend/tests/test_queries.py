@@ -0,0 +1,96 @@
+import json
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+pytestmark = pytest.mark.anyio
+
+
+def auth_headers(user_number: int = 1) -> dict:
+    from app.utils.auth import create_access_token
+
+    return {"Authorization": f"Bearer {create_access_token({'sub': f'user{user_number}@example.com'})}"}
+
+
+@contextmanager
+def record_queries():
+    """Список (SQL, параметры) всех запросов к БД внутри блока"""
+    queries = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        queries.append((statement, parameters))
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield queries
+    finally:
+        event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+
+
+async def explain_indexes(statement: str, parameters) -> set:
+    """Индексы, которые PostgreSQL выбирает для запроса"""
+    from app.database import get_async_engine
+
+    async with get_async_engine().connect() as connection:
+        result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        plan = result.scalar()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+
+    indexes = set()
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if "Index Name" in node:
+            indexes.add(node["Index Name"])
+        nodes.extend(node.get("Plans", []))
+    return indexes
+
+
+async def hot_request(client, method: str, url: str, headers: dict):
+    # Первый запрос загружает пользователя в кеш принципалов и список отозванных токенов
+    await client.request(method, url, headers=headers)
+    with record_queries() as queries:
+        response = await client.request(method, url, headers=headers)
+    assert response.status_code == 200, response.text
+    return queries
+
+
+async def test_post_list_is_one_indexed_query(api_client):
+    queries = await hot_request(api_client, "GET", "/posts/?limit=20", auth_headers(7))
+
+    assert len(queries) == 1, [statement for statement, _ in queries]
+    statement, parameters = queries[0]
+    assert "ix_posts_user_id_created_at_id" in await explain_indexes(statement, parameters)
+
+
+async def test_company_list_is_one_indexed_query(api_client):
+    queries = await hot_request(api_client, "GET", "/companies/", auth_headers(7))
+
+    assert len(queries) == 1, [statement for statement, _ in queries]
+    statement, parameters = queries[0]
+    assert "ix_companies_user_id" in await explain_indexes(statement, parameters)
+
+
+async def test_current_user_cache_miss_is_one_indexed_query(api_client):
+    from app.utils.principal_cache import principal_cache
+
+    headers = auth_headers(7)
+    await api_client.get("/auth/me", headers=headers)
+    principal_cache.clear()
+    with record_queries() as queries:
+        response = await api_client.get("/auth/me", headers=headers)
+    assert response.status_code == 200, response.text
+
+    # Пользователь и компания - одним запросом с JOIN
+    assert len(queries) == 1, [statement for statement, _ in queries]
+    statement, parameters = queries[0]
+    assert {"ix_users_email", "ix_companies_user_id"} <= await explain_indexes(statement, parameters)
+
+
+async def test_cached_principal_needs_no_queries(api_client):
+    queries = await hot_request(api_client, "GET", "/auth/me", auth_headers(7))
+
+    assert queries == []
+